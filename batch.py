@@ -0,0 +1,146 @@
+"""
+file: batch.py
+
+Authors: 
+Kaelan Anderson - kaelananderson@sandiego.edu
+Dillon Timmer - dtimmer@sandiego.edu
+
+Description: 
+Parses many source files against one tokens/grammar pair.  The lexer and
+parse tables are compiled once, in the calling process, and handed to a
+pool of worker processes.  The workers parse the sources and send back the
+parse trees, or the InvalidToken and SourceFileSyntaxError raised for them,
+in the order the sources were given.
+"""
+
+import os
+import sys
+from collections import deque
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor
+from lexer import InvalidToken
+from parse import Parser, SourceFileSyntaxError
+
+# number of sources sent to a worker process at a time
+CHUNK_SIZE = 16
+
+# chunks per worker process sent out ahead of the results read back
+CHUNKS_IN_FLIGHT = 2
+
+# compiled parser of a worker process, set by init_worker
+worker_parser = None
+
+def init_worker(parser):
+    """ Keeps the compiled parser handed to a worker process. """
+
+    global worker_parser
+    worker_parser = parser
+
+def parse_with(parser, source):
+    """ Parses source with parser.
+
+    Returns: list or Exception
+        The parse tree of the source, or the InvalidToken or 
+        SourceFileSyntaxError raised while parsing it.
+    """
+
+    try:
+        return parser.parse(source)
+    except (InvalidToken, SourceFileSyntaxError) as error:
+        return error
+
+def parse_source(source):
+    """ Parses source with the parser of the worker process. """
+
+    return parse_with(worker_parser, source)
+
+def parse_chunk(sources):
+    """ Parses a list of sources with the parser of the worker process,
+    and returns the list of their results.
+    """
+
+    return [parse_source(source) for source in sources]
+
+class BatchParser:
+    """ Parses many sources with one compiled grammar, on a pool
+    of worker processes.
+    """
+
+    def __init__(self, lexer_filename, grammar_filename, workers=None, chunksize=CHUNK_SIZE, cache_dir=None,
+                 method="slr", tables="dict"):
+        """ Compiles the lexer and parse tables.
+
+        Parameters:
+        lexer_filename, grammar_filename, cache_dir, method, tables:
+            As for Parser.
+
+        workers: int or None
+            Number of worker processes, the number of CPUs if None.  With 
+            1 worker the sources are parsed in the calling process.
+
+        chunksize: int
+            Number of sources sent to a worker at a time.
+
+        Exceptions raised:
+
+        NonLRGrammarError, if the grammar is not LR.
+        """
+
+        self.parser = Parser(lexer_filename, grammar_filename, cache_dir=cache_dir, method=method, tables=tables)
+        self.workers = workers if workers is not None else os.cpu_count() or 1
+        self.chunksize = chunksize
+
+    def parse(self, sources):
+        """ Parses every source.
+
+        Parameters:
+
+        sources: iterable
+            File names, or other sources accepted by Parser.parse that can
+            be pickled, such as lists of strings.
+
+        Returns: generator
+            Yields (source, result) in the order of sources, where result
+            is the parse tree list, or the InvalidToken or 
+            SourceFileSyntaxError instance raised for the source.  Any other
+            exception stops the batch.
+
+        sources is read lazily: at most CHUNKS_IN_FLIGHT chunks per
+        worker are sent out ahead of the results yielded, so a generator 
+        of sources is never read into memory as a whole.
+        """
+
+        if self.workers == 1:
+            for source in sources:
+                yield source, parse_with(self.parser, source)
+            return
+
+        sources = iter(sources)
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=init_worker,
+                                 initargs=(self.parser,)) as executor:
+            pending = deque()
+            while True:
+                # keep every worker busy with the next chunks of sources
+                while len(pending) < self.workers * CHUNKS_IN_FLIGHT:
+                    chunk = list(islice(sources, self.chunksize))
+                    if not chunk:
+                        break
+                    pending.append((chunk, executor.submit(parse_chunk, chunk)))
+                if not pending:
+                    break
+
+                chunk, future = pending.popleft()
+                for source, result in zip(chunk, future.result()):
+                    yield source, result
+
+if __name__ == "__main__":
+    if len(sys.argv) < 4:
+        print("Usage: python3 batch.py tokens_filename grammar_filename source_filename ...")
+        sys.exit(0)
+
+    batch = BatchParser(sys.argv[1], sys.argv[2])
+    for source, result in batch.parse(sys.argv[3:]):
+        if isinstance(result, Exception):
+            print(f"{source}: {type(result).__name__}")
+        else:
+            print(f"{source}: {' '.join(result)}")
@@ -0,0 +1,225 @@
+"""
+file: bench.py
+
+Authors:
+Kaelan Anderson - kaelananderson@sandiego.edu
+Dillon Timmer - dtimmer@sandiego.edu
+
+Description:
+Benchmarks for the lexer and parser.  Regex compilation (RegEx.to_nfa and
+NFA.to_DFA), Lex.next_token, the table construction phases of Parser
+(compute_first, compute_follow, compute_parse_table_states) and
+Parser.parse are timed on the tokens/grammar/src fixtures, on scaled up
+copies of the fixture sources, and on grammars made by generate.py with
+many precedence levels.  Each benchmark reports the time per operation,
+operations per second, peak memory traced by tracemalloc and, for lexing
+and parsing, tokens per second.  Results are written as JSON, and a
+previous results file can be given to report the change of each
+benchmark.
+
+Usage: python3 bench.py [--output results.json] [--compare old.json] [--quick]
+"""
+
+import os
+import json
+import time
+import timeit
+import argparse
+import platform
+import tempfile
+import tracemalloc
+from parse import Parser, NonLRGrammarError
+from generate import generate
+
+# fixtures whose grammars are SLR and whose sources parse
+FIXTURES = [1, 2, 3, 4, 5, 6]
+
+# fixture sources repeated to make scaled up inputs.  Each repeat of src4
+# is a list of statements, so copies joined by ';' still parse.
+LEX_SCALE = 200
+PARSE_SCALE = 20
+
+# precedence levels, statement kinds and statements of the generated grammars
+SYNTHETIC_LEVELS = [10, 40]
+SYNTHETIC_KINDS = 50
+SYNTHETIC_STATEMENTS = 20
+
+# a benchmark is repeated until it has run for about this many seconds
+MIN_TIME = 0.2
+
+def measure(function, repeat=3, min_time=MIN_TIME):
+    """ Times function, and traces its peak memory in a separate call.
+
+    Parameters:
+
+    function: callable
+        The operation being measured, called with no arguments.
+
+    repeat: int
+        Number of timing runs; the fastest is reported.
+
+    min_time: float
+        Each timing run calls function enough times to last about this long.
+
+    Returns: dict
+        seconds per call, ops_per_sec and peak_bytes.
+    """
+
+    # calibrate the number of calls per run
+    number = 1
+    while True:
+        elapsed = timeit.timeit(function, number=number)
+        if elapsed >= min_time / 4 or number >= 1 << 20:
+            break
+        number *= 4
+    number = max(1, int(number * min_time / max(elapsed, 1e-9)))
+
+    best = min(timeit.repeat(function, repeat=repeat, number=number)) / number
+
+    tracemalloc.start()
+    function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {"seconds": best, "ops_per_sec": 1 / best, "peak_bytes": peak}
+
+def per_op(result, count):
+    """ Divides a result of measure that timed count operations per call 
+    into the time of one, so ops_per_sec stays 1 / seconds.  count is 
+    kept as "regexes"; peak_bytes is still that of the whole call.
+    """
+
+    result["seconds"] /= count
+    result["ops_per_sec"] = 1 / result["seconds"]
+    result["regexes"] = count
+    return result
+
+def count_tokens(lexer, source):
+    """ Returns the number of tokens lexer finds in source. """
+
+    scanner = lexer.for_source(source)
+    count = 0
+    try:
+        while True:
+            scanner.next_token()
+            count += 1
+    except EOFError:
+        return count
+
+def cases(directory, quick=False):
+    """ Returns (name, tokens_filename, grammar_filename, source, lex_source)
+    for each input benchmarked.  source is what Parser.parse is run on,
+    and lex_source what Lex.next_token is run on.
+    """
+
+    found = []
+    for i in FIXTURES:
+        source = [open(f"src{i}.txt").read()]
+        found.append((f"fixture{i}", f"tokens{i}.txt", f"grammar{i}.txt", source, source))
+
+    # scaled up copies of src4
+    text = open("src4.txt").read().strip()
+    lex_scale = LEX_SCALE // 10 if quick else LEX_SCALE
+    found.append((f"fixture4x{PARSE_SCALE}", "tokens4.txt", "grammar4.txt",
+                  [";\n".join([text] * PARSE_SCALE)], ["\n".join([text] * lex_scale)]))
+
+    for levels in SYNTHETIC_LEVELS[:1] if quick else SYNTHETIC_LEVELS:
+        tokens_filename, grammar_filename, source_filename, _ = generate(directory, f"levels{levels}",
+            SYNTHETIC_KINDS, levels, SYNTHETIC_STATEMENTS)
+        source = [open(source_filename).read()]
+        found.append((f"levels{levels}", tokens_filename, grammar_filename, source, source))
+
+    return found
+
+def run(quick=False):
+    """ Runs every benchmark.
+
+    Returns: dict
+        "meta" describes the run, and "results" maps each benchmark name,
+        phase/input, to the dict returned by measure.
+    """
+
+    results = {}
+    min_time = MIN_TIME / 4 if quick else MIN_TIME
+
+    with tempfile.TemporaryDirectory() as directory:
+        for name, tokens_filename, grammar_filename, source, lex_source in cases(directory, quick):
+            try:
+                parser = Parser(tokens_filename, grammar_filename)
+            except NonLRGrammarError:
+                continue
+            lexer = parser.lexer
+
+            # regex compilation of every token of the input, counting each regex as an op
+            regexes = list(lexer.tokens_dict.values())
+            result = measure(lambda: [regex.to_nfa() for regex in regexes], min_time=min_time)
+            results[f"regex_to_nfa/{name}"] = per_op(result, len(regexes))
+
+            nfas = [regex.to_nfa() for regex in regexes]
+            result = measure(lambda: [nfa.to_DFA() for nfa in nfas], min_time=min_time)
+            results[f"nfa_to_dfa/{name}"] = per_op(result, len(nfas))
+
+            # lexing
+            tokens = count_tokens(lexer, lex_source)
+            result = measure(lambda: count_tokens(lexer, lex_source), min_time=min_time)
+            result["tokens"] = tokens
+            result["tokens_per_sec"] = tokens / result["seconds"]
+            results[f"lex/{name}"] = result
+
+            # table construction phases
+            results[f"first/{name}"] = measure(parser.compute_first, min_time=min_time)
+            results[f"follow/{name}"] = measure(parser.compute_follow, min_time=min_time)
+            results[f"parse_table_states/{name}"] = measure(parser.compute_parse_table_states,
+                                                            min_time=min_time)
+
+            # end to end parsing of the source
+            tokens = count_tokens(lexer, source)
+            result = measure(lambda: parser.parse(source), min_time=min_time)
+            result["tokens"] = tokens
+            result["tokens_per_sec"] = tokens / result["seconds"]
+            results[f"parse/{name}"] = result
+
+    meta = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "quick": quick,
+    }
+    return {"meta": meta, "results": results}
+
+def compare(old, new):
+    """ Prints the change of each benchmark found in both old and new results. """
+
+    for name, result in new["results"].items():
+        if name not in old["results"]:
+            continue
+        before = old["results"][name]["seconds"]
+        change = (result["seconds"] - before) / before * 100
+        print(f"{name:40} {before * 1e3:10.3f} ms -> {result['seconds'] * 1e3:10.3f} ms  {change:+7.1f}%")
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Benchmark the lexer and parser.")
+    arg_parser.add_argument("--output", help="file to write the results to as JSON")
+    arg_parser.add_argument("--compare", help="results file of an earlier run to compare with")
+    arg_parser.add_argument("--quick", action="store_true", help="smaller inputs and shorter runs")
+    args = arg_parser.parse_args()
+
+    # fixtures are found relative to this file
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+    results = run(args.quick)
+
+    for name, result in results["results"].items():
+        line = f"{name:40} {result['seconds'] * 1e3:10.3f} ms {result['ops_per_sec']:12.1f} ops/s"
+        line += f" {result['peak_bytes'] / 1024:10.1f} KiB"
+        if "tokens_per_sec" in result:
+            line += f" {result['tokens_per_sec']:12.0f} tokens/s"
+        print(line)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), results)
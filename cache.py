@@ -0,0 +1,65 @@
+"""
+file: cache.py
+
+Authors: 
+Kaelan Anderson - kaelananderson@sandiego.edu
+Dillon Timmer - dtimmer@sandiego.edu
+
+Description: 
+Helpers for the on-disk caches of compiled lexers and parse tables.
+Each cache entry is a JSON file named by a hash of the specification
+it was compiled from, so editing a tokens or grammar file never reuses
+a stale entry.
+"""
+
+import os
+import json
+import hashlib
+import tempfile
+
+def cache_path(cache_dir, kind, spec, version):
+	"""
+	Returns the file in cache_dir holding the data of the given kind
+	("lex" or "parse") compiled from the specification text spec with
+	the given format version.
+	"""
+
+	key = hashlib.sha256(f"{kind}\n{version}\n{spec}".encode()).hexdigest()
+	return os.path.join(cache_dir, f"{kind}-{key}.json")
+
+def load_cache(path, version):
+	"""
+	Returns the data cached in the file path, or None if the file is
+	missing, unreadable or was written with another format version.
+	"""
+
+	try:
+		with open(path, 'r') as f:
+			entry = json.load(f)
+	except (OSError, ValueError):
+		return None
+
+	if not isinstance(entry, dict) or entry.get("version") != version:
+		return None
+
+	return entry.get("data")
+
+def save_cache(path, version, data):
+	"""
+	Writes data to the file path.  The file is replaced atomically,
+	so concurrent readers never see a partial entry.  Failing to write
+	the cache is not an error.
+	"""
+
+	directory = os.path.dirname(path) or '.'
+	try:
+		os.makedirs(directory, exist_ok=True)
+		fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+		try:
+			with os.fdopen(fd, 'w') as f:
+				json.dump({"version": version, "data": data}, f)
+			os.replace(temp_path, path)
+		except (OSError, TypeError, ValueError):
+			os.remove(temp_path)
+	except OSError:
+		pass
@@ -11,6 +11,7 @@ if an input string is in the language of the DFA.
 """
 
 import sys
+from array import array
 
 class FileFormatError(Exception):
     """
@@ -35,6 +36,8 @@ class DFA:
         self.transitions = {}
         self.start_state = None
         self.accept_states = set()
+        self.accept_tokens = {} # token recognized by each accept state, if tagged
+        self.compiled = None # CompiledDFA built on the first call to compile
 
         if filename:
 
@@ -70,19 +73,22 @@ class DFA:
 
                 # else, next line must be start state
                 else:
-                    self.start_state = line.strip()
+                    try:
+                        self.start_state = int(line.strip())
+                    except:
+                        raise FileFormatError
                     # check state in range
-                    if not (1 <= int(self.start_state) <= self.num_states):
+                    if not (1 <= self.start_state <= self.num_states):
                         raise FileFormatError
                     break
 
             # set accept states, check if each in range
-            self.accept_states = set(f.readline().strip().split())
+            try:
+                self.accept_states = {int(state) for state in f.readline().strip().split()}
+            except:
+                raise FileFormatError
             for state in self.accept_states:
-                try:
-                    if not (1 <= int(state) <= self.num_states):
-                        raise FileFormatError
-                except:
+                if not (1 <= state <= self.num_states):
                     raise FileFormatError
 
             # check if extra line
@@ -100,17 +106,135 @@ class DFA:
         of the DFA.
         """
 
-        current_state = self.start_state
+        return self.compile().simulate(str)
 
-        # update state for each transition
-        for char in str:
-            try:
-                current_state = self.transitions[(current_state, char)]
-            except:
-                return False
+    def minimize(self):
+        """
+        Returns an equivalent DFA with the fewest states, found with
+        Hopcroft's partition refinement in O(n k log n) time for n states
+        and an alphabet of size k.
+
+        States unreachable from the start state are removed, accept states
+        tagged with different tokens are never merged, and the states that
+        cannot reach an accept state are dropped, so a missing transition
+        in the returned DFA means the input is rejected.  States are
+        numbered 1, ..., num_states in breadth first order from the start
+        state, which is always 1.
+        """
+
+        alphabet = list(dict.fromkeys(self.alphabet))
+
+        # outgoing transitions of every state
+        moves = {}
+        for (state, char), next_state in self.transitions.items():
+            moves.setdefault(state, {})[char] = next_state
+
+        # keep only the states reachable from the start state
+        reachable = {self.start_state}
+        stack = [self.start_state]
+        while stack:
+            for next_state in moves.get(stack.pop(), {}).values():
+                if next_state not in reachable:
+                    reachable.add(next_state)
+                    stack.append(next_state)
+
+        # dead state (None) stands in for every missing transition
+        dead = None
+        states = list(reachable) + [dead]
+        inverse = {char: {} for char in alphabet}
+        for state in states:
+            for char in alphabet:
+                next_state = moves.get(state, {}).get(char, dead) if state is not dead else dead
+                inverse[char].setdefault(next_state, []).append(state)
+
+        # initial partition by accepting token (or plain acceptance)
+        groups = {}
+        for state in states:
+            key = (state in self.accept_states, self.accept_tokens.get(state))
+            groups.setdefault(key, set()).add(state)
+        blocks = list(groups.values())
+        block_of = {}
+        for index, block in enumerate(blocks):
+            for state in block:
+                block_of[state] = index
+
+        # refine until no splitter splits any block
+        worklist = set(range(len(blocks)))
+        while worklist:
+            splitter = list(blocks[worklist.pop()])
+            for char in alphabet:
+
+                # states that move into the splitter on char, grouped by block
+                touched = {}
+                for state in splitter:
+                    for previous in inverse[char].get(state, ()):
+                        touched.setdefault(block_of[previous], set()).add(previous)
+
+                for index, inside in touched.items():
+                    block = blocks[index]
+                    if len(inside) == len(block):
+                        continue
+
+                    # split the block, moving the smaller half to a new block
+                    # so a split costs O(|smaller half|) rather than O(|block|)
+                    if 2 * len(inside) <= len(block):
+                        smaller = inside
+                    else:
+                        smaller = block - inside
+                    block.difference_update(smaller)
+                    blocks.append(smaller)
+                    new_index = len(blocks) - 1
+                    for state in smaller:
+                        block_of[state] = new_index
+
+                    # both halves are pending if the block was, otherwise the smaller one is enough
+                    worklist.add(new_index)
+
+        # number the live blocks breadth first from the start block
+        minimized = DFA()
+        minimized.alphabet = self.alphabet
+        dead_block = block_of[dead]
+        start_block = block_of[self.start_state]
+        minimized.start_state = 1
+        minimized.num_states = 1
+
+        if start_block == dead_block:
+            return minimized
 
-        # return bool of final state being accept state
-        return current_state in self.accept_states
+        numbers = {start_block: 1}
+        queue = [start_block]
+        for block in queue:
+            representative = next(iter(blocks[block]))
+            state = numbers[block]
+
+            if representative in self.accept_states:
+                minimized.accept_states.add(state)
+            if representative in self.accept_tokens:
+                minimized.accept_tokens[state] = self.accept_tokens[representative]
+
+            for char in alphabet:
+                next_block = block_of[moves.get(representative, {}).get(char, dead)]
+                if next_block == dead_block:
+                    continue
+                if next_block not in numbers:
+                    minimized.num_states += 1
+                    numbers[next_block] = minimized.num_states
+                    queue.append(next_block)
+                minimized.transitions[(state, char)] = numbers[next_block]
+
+        return minimized
+
+    def compile(self):
+        """
+        Returns the CompiledDFA equivalent to the DFA, building it on 
+        the first call.  Changes made to the DFA after it is compiled 
+        are not reflected in the compiled table.
+        """
+
+        if self.compiled is None:
+            self.compiled = CompiledDFA(self)
+
+        return self.compiled
 
     def transition(self, state, symbol):
         """
@@ -121,6 +245,211 @@ class DFA:
         """
         return (self.transitions[((state), (symbol))])
 
+class CompiledDFA:
+    """
+    A DFA stored as a flat integer transition table.
+
+    Characters of the alphabet are mapped to the dense codes 0, ..., k-1 
+    and states to 0, ..., n-1, with the start state numbered 0.  The state
+    reached from state s on the character with code c is 
+    table[s * k + c], or -1 if the input can no longer be accepted.
+    """
+
+    def __init__(self, dfa=None):
+        """
+        Initializes the table from the DFA object dfa.  States that 
+        cannot reach an accept state are dropped, and transitions into 
+        them become -1.  With no dfa the table is left empty, to be
+        filled in by from_dict.
+        """
+
+        # ByteDFAs built from the table, keyed by their excluded bytes
+        self.byte_dfas = {}
+
+        if dfa is None:
+            return
+
+        # map each character of the alphabet to a dense code
+        self.codes = {char: code for code, char in enumerate(dict.fromkeys(dfa.alphabet))}
+        self.alphabet_size = len(self.codes)
+
+        # find the states that can reach an accept state
+        accept_states = {int(state) for state in dfa.accept_states}
+        predecessors = {}
+        for (state, char), next_state in dfa.transitions.items():
+            predecessors.setdefault(int(next_state), set()).add(int(state))
+        live = set(accept_states)
+        stack = list(accept_states)
+        while stack:
+            for state in predecessors.get(stack.pop(), ()):
+                if state not in live:
+                    live.add(state)
+                    stack.append(state)
+
+        # number live states from 0, starting with the start state
+        start_state = int(dfa.start_state) if dfa.start_state is not None else None
+        self.states = {}
+        for state in [start_state] + sorted(live):
+            if state in live and state not in self.states:
+                self.states[state] = len(self.states)
+        self.num_states = len(self.states)
+        self.start = 0 if start_state in live else -1
+
+        # fill the table, -1 where there is no live transition
+        self.table = array('i', [-1]) * (self.num_states * self.alphabet_size)
+        for (state, char), next_state in dfa.transitions.items():
+            state, next_state = int(state), int(next_state)
+            if state in self.states and next_state in self.states and char in self.codes:
+                self.table[self.states[state] * self.alphabet_size + self.codes[char]] = self.states[next_state]
+
+        # accept flag and token of every state
+        self.accepting = bytearray(self.num_states)
+        self.accept_tokens = [None] * self.num_states
+        for state, index in self.states.items():
+            if state in accept_states:
+                self.accepting[index] = 1
+            self.accept_tokens[index] = dfa.accept_tokens.get(state)
+
+    def to_dict(self):
+        """
+        Returns the table as a dictionary of lists and ints that can 
+        be written out as JSON and read back with from_dict.
+        """
+
+        return {
+            "alphabet": list(self.codes),
+            "num_states": self.num_states,
+            "start": self.start,
+            "table": self.table.tolist(),
+            "accepting": list(self.accepting),
+            "accept_tokens": self.accept_tokens,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """ Returns the CompiledDFA described by a dictionary from to_dict. """
+
+        compiled = cls()
+        compiled.codes = {char: code for code, char in enumerate(data["alphabet"])}
+        compiled.alphabet_size = len(compiled.codes)
+        compiled.num_states = data["num_states"]
+        compiled.states = {state: state for state in range(compiled.num_states)}
+        compiled.start = data["start"]
+        compiled.table = array('i', data["table"])
+        compiled.accepting = bytearray(data["accepting"])
+        compiled.accept_tokens = list(data["accept_tokens"])
+
+        if len(compiled.table) != compiled.num_states * compiled.alphabet_size:
+            raise ValueError("transition table does not match its dimensions")
+
+        return compiled
+
+    def copy(self):
+        """
+        Returns a copy of the table that shares nothing that can be 
+        changed with it, without the ByteDFAs built from it.
+        """
+
+        compiled = CompiledDFA()
+        compiled.codes = dict(self.codes)
+        compiled.alphabet_size = self.alphabet_size
+        compiled.num_states = self.num_states
+        compiled.states = dict(self.states)
+        compiled.start = self.start
+        compiled.table = array('i', self.table)
+        compiled.accepting = bytearray(self.accepting)
+        compiled.accept_tokens = list(self.accept_tokens)
+        return compiled
+
+    def simulate(self, str):
+        """
+        Returns True if str is in the language of the DFA,
+        and False if not.
+        """
+
+        table = self.table
+        codes = self.codes
+        k = self.alphabet_size
+
+        state = self.start
+        if state < 0:
+            return False
+
+        for char in str:
+            # characters outside the alphabet are rejected
+            try:
+                state = table[state * k + codes[char]]
+            except KeyError:
+                return False
+            if state < 0:
+                return False
+
+        return self.accepting[state] == 1
+
+    def to_bytes(self, exclude=b""):
+        """
+        Returns the ByteDFA equivalent to this table over byte values.
+        The bytes in exclude go to the dead state from every state.  It
+        is built on the first call for exclude and shared by later ones.
+        """
+
+        exclude = bytes(exclude)
+        byte_dfa = self.byte_dfas.get(exclude)
+        if byte_dfa is None:
+            byte_dfa = self.byte_dfas[exclude] = ByteDFA(self, exclude)
+
+        return byte_dfa
+
+class ByteDFA:
+    """
+    A CompiledDFA over byte values, for scanning bytes-like input with
+    integer indexing and no per-character string objects.
+
+    Every state has a row of 256 entries, one per byte value: the state
+    reached from state s on byte b is rows[s][b], or -1 (the dead state) 
+    if the input can no longer be accepted.  The characters of the 
+    alphabet are matched as the bytes of their latin-1 codes, and every
+    other byte goes straight to the dead state.  States, the start state,
+    accepting and accept_tokens are numbered as in the CompiledDFA.
+    """
+
+    def __init__(self, compiled, exclude=b""):
+        """
+        Initializes the rows from the CompiledDFA compiled.  The bytes in
+        exclude go to the dead state even if their characters are in the
+        alphabet.
+        """
+
+        self.num_states = compiled.num_states
+        self.start = compiled.start
+        self.accepting = compiled.accepting
+        self.accept_tokens = compiled.accept_tokens
+
+        # copy the column of each character into the column of its byte
+        k = compiled.alphabet_size
+        table = array('i', [-1]) * (self.num_states * 256)
+        for char, code in compiled.codes.items():
+            if len(char) == 1 and ord(char) < 256 and ord(char) not in exclude:
+                table[ord(char)::256] = compiled.table[code::k]
+
+        # rows are lists, whose ints are looked up without being boxed again
+        self.rows = [table[state * 256: (state + 1) * 256].tolist() for state in range(self.num_states)]
+
+    def simulate(self, data):
+        """
+        Returns True if the bytes data are in the language of the DFA,
+        and False if not.
+        """
+
+        rows = self.rows
+        state = self.start
+        for byte in data:
+            if state < 0:
+                return False
+            state = rows[state][byte]
+
+        return state >= 0 and self.accepting[state] == 1
+
 if __name__ == "__main__":
     # You can run your dfa.py code directly from a
     # terminal command line:
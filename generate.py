@@ -0,0 +1,271 @@
+"""
+file: generate.py
+
+Authors:
+Kaelan Anderson - kaelananderson@sandiego.edu
+Dillon Timmer - dtimmer@sandiego.edu
+
+Description:
+Generates tokens, grammar, source and correct files, in the formats of the
+test fixtures, at any scale.  The grammar is a statement language with one
+keyword and rule per statement kind, blocks of nested statements, optional
+initializers (an epsilon rule) and expressions over any number of binary
+operator precedence levels.  The source is derived from the grammar with
+a fixed seed, and the parse tree of the derivation is written to the
+correct file, so the expected output is known without running the parser.
+An invalid token or a syntax error can be put in the middle of the source,
+in which case the correct file names the exception instead.
+
+Usage: python3 generate.py [--name NAME] [--kinds N] [--levels N] [--statements N] ...
+"""
+
+import os
+import random
+import argparse
+
+# shapes of the statement kinds, the first kind is always an expression
+SHAPES = ("expr", "assign", "block", "optional")
+
+# identifiers used in generated sources
+IDENTIFIERS = ("a", "b", "c", "d", "ab", "cd", "abc", "a1", "b22", "dcba3")
+
+DIGITS = "(0|1|2|3|4|5|6|7|8|9)"
+
+def statement_kinds(kinds, seed=0):
+    """ Returns the shape of each of the statement kinds of the grammar. """
+
+    rng = random.Random(seed)
+    return ["expr"] + [rng.choice(SHAPES) for _ in range(kinds - 1)]
+
+def write_tokens(filename, kinds, levels):
+    """ Writes the tokens file of the grammar. """
+
+    with open(filename, "w") as f:
+        f.write('"abcdk0123456789#=;(){}@"\n')
+        f.write('ID "(a|b|c|d)(a|b|c|d|0|1|2|3|4|5|6|7|8|9)*"\n')
+        f.write(f'NUM "{DIGITS}{DIGITS}*"\n')
+        f.write('ASSIGN "="\n')
+        f.write('SEMICOLON ";"\n')
+        f.write('LEFT_PAREN "\\("\n')
+        f.write('RIGHT_PAREN "\\)"\n')
+        f.write('LEFT_BRACE "{"\n')
+        f.write('RIGHT_BRACE "}"\n')
+        for level in range(levels):
+            f.write(f'OP{level} "#{level}"\n')
+        for kind in range(len(kinds)):
+            f.write(f'KEYWORD{kind} "k{kind}"\n')
+
+def write_grammar(filename, kinds, levels):
+    """ Writes the grammar file.  The grammar is SLR for any number of
+    statement kinds and precedence levels.
+    """
+
+    with open(filename, "w") as f:
+        f.write("ID NUM ASSIGN SEMICOLON LEFT_PAREN RIGHT_PAREN LEFT_BRACE RIGHT_BRACE\n")
+        f.write(" ".join(f"OP{level}" for level in range(levels)) + "\n")
+        f.write(" ".join(f"KEYWORD{kind}" for kind in range(len(kinds))) + "\n")
+        f.write("%%\n")
+        f.write("statements : statements SEMICOLON statement\n")
+        f.write("statements : statement\n")
+        for kind in range(len(kinds)):
+            f.write(f"statement : statement{kind}\n")
+        for kind, shape in enumerate(kinds):
+            if shape == "expr":
+                f.write(f"statement{kind} : KEYWORD{kind} level0\n")
+            elif shape == "assign":
+                f.write(f"statement{kind} : KEYWORD{kind} ID ASSIGN level0\n")
+            elif shape == "block":
+                f.write(f"statement{kind} : KEYWORD{kind} LEFT_BRACE statements RIGHT_BRACE\n")
+            else:
+                f.write(f"statement{kind} : KEYWORD{kind} ID initializer\n")
+        f.write("initializer : ASSIGN level0\n")
+        f.write("initializer : eps\n")
+        for level in range(levels):
+            operand = f"level{level + 1}" if level + 1 < levels else "primary"
+            f.write(f"level{level} : level{level} OP{level} {operand}\n")
+            f.write(f"level{level} : {operand}\n")
+        f.write("primary : LEFT_PAREN level0 RIGHT_PAREN\n")
+        f.write("primary : ID\n")
+        f.write("primary : NUM\n")
+
+def generate_source(kinds, levels, statements, blocks=2, nesting=3, paren_rate=0.2, op_rate=0.2, seed=0):
+    """ Derives a source from the grammar.
+
+    The derivation is leftmost, expanding the symbols from an explicit
+    stack, so the nodes are visited in the depth-first, pre-order of the
+    parse tree and any nesting depth can be generated.
+
+    Parameters:
+
+    kinds: list of string
+        Shapes of the statement kinds, from statement_kinds.
+
+    levels: int
+        Number of operator precedence levels.
+
+    statements: int
+        Number of top level statements.
+
+    blocks: int
+        Deepest nesting of block statements.
+
+    nesting: int
+        Deepest nesting of parentheses in expressions.
+
+    paren_rate: float
+        Chance that an operand is a parenthesized expression.
+
+    op_rate: float
+        Chance of each further operator at a precedence level.
+
+    seed: int
+        Seed of the random choices.
+
+    Returns: (words, tree)
+        The tokens of the source, and the parse tree as a list of nodes in
+        depth-first, pre-order, as returned by Parser.parse.
+    """
+
+    rng = random.Random(seed)
+    words = []
+    tree = []
+
+    # stack entries are (symbol, arguments...), the leftmost symbol on top
+    stack = [("statements", statements, blocks)]
+    while stack:
+        entry = stack.pop()
+        symbol = entry[0]
+
+        if symbol == "word":
+            words.append(entry[1])
+            tree.append(entry[1])
+
+        elif symbol == "statements":
+            _, count, depth = entry
+            tree.append("statements")
+            if count > 1:
+                stack.append(("statement", depth))
+                stack.append(("word", ";"))
+                stack.append(("statements", count - 1, depth))
+            else:
+                stack.append(("statement", depth))
+
+        elif symbol == "statement":
+            depth = entry[1]
+            kind = rng.randrange(len(kinds))
+            if kinds[kind] == "block" and depth == 0:
+                kind = 0
+            shape = kinds[kind]
+            tree.append("statement")
+            tree.append(f"statement{kind}")
+            rhs = [("word", f"k{kind}")]
+            if shape == "expr":
+                rhs.append(("level", 0, nesting, None))
+            elif shape == "assign":
+                rhs += [("word", rng.choice(IDENTIFIERS)), ("word", "="), ("level", 0, nesting, None)]
+            elif shape == "block":
+                rhs += [("word", "{"), ("statements", rng.randint(1, 3), depth - 1), ("word", "}")]
+            else:
+                rhs += [("word", rng.choice(IDENTIFIERS)), ("initializer",)]
+            stack.extend(reversed(rhs))
+
+        elif symbol == "initializer":
+            tree.append("initializer")
+            if rng.random() < 0.5:
+                stack.extend(reversed([("word", "="), ("level", 0, nesting, None)]))
+            else:
+                tree.append("eps")
+
+        elif symbol == "level":
+            _, level, depth, operators = entry
+            if operators is None:
+                operators = 0
+                while rng.random() < op_rate:
+                    operators += 1
+            tree.append(f"level{level}")
+            operand = ("level", level + 1, depth, None) if level + 1 < levels else ("primary", depth)
+            if operators > 0:
+                stack.extend(reversed([("level", level, depth, operators - 1), ("word", f"#{level}"), operand]))
+            else:
+                stack.append(operand)
+
+        elif symbol == "primary":
+            depth = entry[1]
+            tree.append("primary")
+            if depth > 0 and rng.random() < paren_rate:
+                stack.extend(reversed([("word", "("), ("level", 0, depth - 1, None), ("word", ")")]))
+            elif rng.random() < 0.5:
+                stack.append(("word", rng.choice(IDENTIFIERS)))
+            else:
+                stack.append(("word", str(rng.randrange(10000))))
+
+    return words, tree
+
+def generate(directory, name, kinds=20, levels=5, statements=100, blocks=2, nesting=3, paren_rate=0.2,
+             op_rate=0.2, error=None, seed=0):
+    """ Writes tokens{name}.txt, grammar{name}.txt, src{name}.txt and
+    correct{name}.txt in directory.
+
+    Parameters:
+
+    kinds: int
+        Number of statement kinds, each with its own keyword and rule.
+
+    error: string or None
+        "InvalidToken" to put a character matching no token in the middle
+        of the source, or "SourceFileSyntaxError" to put an unmatched
+        parenthesis there.
+
+    Other parameters are those of generate_source.
+
+    Returns: (tokens_filename, grammar_filename, source_filename, correct_filename)
+    """
+
+    shapes = statement_kinds(kinds, seed)
+    filenames = tuple(os.path.join(directory, f"{prefix}{name}.txt")
+                      for prefix in ("tokens", "grammar", "src", "correct"))
+    tokens_filename, grammar_filename, source_filename, correct_filename = filenames
+
+    write_tokens(tokens_filename, shapes, levels)
+    write_grammar(grammar_filename, shapes, levels)
+    words, tree = generate_source(shapes, levels, statements, blocks, nesting, paren_rate, op_rate, seed)
+
+    if error == "InvalidToken":
+        words.insert(len(words) // 2, "@")
+    elif error == "SourceFileSyntaxError":
+        words.insert(len(words) // 2, ")")
+    elif error is not None:
+        raise ValueError(f"Unknown error {error}")
+
+    # one statement per line
+    with open(source_filename, "w") as f:
+        f.write(" ".join(words).replace(" ; ", " ;\n") + "\n")
+
+    with open(correct_filename, "w") as f:
+        if error is None:
+            f.write("Valid\n")
+            f.write(" ".join(tree) + "\n")
+        else:
+            f.write(error + "\n")
+
+    return filenames
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Generate tokens, grammar, source and correct files.")
+    arg_parser.add_argument("--directory", default=".", help="directory to write the files to")
+    arg_parser.add_argument("--name", default="_generated", help="suffix of the file names")
+    arg_parser.add_argument("--kinds", type=int, default=20, help="number of statement kinds")
+    arg_parser.add_argument("--levels", type=int, default=5, help="number of operator precedence levels")
+    arg_parser.add_argument("--statements", type=int, default=100, help="number of top level statements")
+    arg_parser.add_argument("--blocks", type=int, default=2, help="deepest nesting of blocks")
+    arg_parser.add_argument("--nesting", type=int, default=3, help="deepest nesting of parentheses")
+    arg_parser.add_argument("--paren-rate", type=float, default=0.2, help="chance of a parenthesized operand")
+    arg_parser.add_argument("--op-rate", type=float, default=0.2, help="chance of each further operator")
+    arg_parser.add_argument("--error", choices=("InvalidToken", "SourceFileSyntaxError"),
+                            help="put this error in the middle of the source")
+    arg_parser.add_argument("--seed", type=int, default=0, help="seed of the random choices")
+    args = arg_parser.parse_args()
+
+    for filename in generate(args.directory, args.name, args.kinds, args.levels, args.statements, args.blocks,
+                             args.nesting, args.paren_rate, args.op_rate, args.error, args.seed):
+        print(filename)
@@ -0,0 +1,406 @@
+"""
+file: incremental.py
+
+Authors:
+Kaelan Anderson - kaelananderson@sandiego.edu
+Dillon Timmer - dtimmer@sandiego.edu
+
+Description:
+Incremental reparsing.  IncrementalParser parses a source text into a
+Document, which keeps the text, its tokens with their offsets and a parse
+tree whose nodes record the LR state they were parsed from and the number
+of tokens they span.  reparse takes a Document and a list of text edits,
+relexes only the tokens the edits can change, and parses the new token stream
+reusing every subtree of the old tree that lies outside the relexed tokens
+and that the parser reaches in the same state it was parsed from.  The LR
+parser is deterministic, so such a subtree would be parsed again exactly as
+it was, and it is pushed onto the stack whole instead.  Only the tokens of
+the edit and the nodes around it are parsed again.
+"""
+
+import time
+from array import array
+from lexer import InvalidToken
+from parse import ParseTree, SourceFileSyntaxError
+
+# the node arrays shared by successive documents are compacted once they
+# hold this many times the nodes they held after the last compaction
+COMPACT_RATIO = 2
+
+class IncrementalTree(ParseTree):
+    """ A ParseTree whose nodes also record, for node n:
+
+    state[n], the index of the LR state on top of the parser's stack when
+    the node was started, that is the state the node was parsed from.
+
+    size[n], the number of tokens the node spans, 0 for epsilon leaves
+    and nodes deriving only epsilon.
+
+    Reparsing adds the new nodes of each parse to the same arrays, so the
+    trees of successive documents share their unchanged subtrees, and the
+    root of each tree is kept by its Document rather than being the last
+    node.
+    """
+
+    def __init__(self, symbol_names):
+        """ Initializes an empty tree.
+
+        Parameters:
+        symbol_names: list of string
+            Names of the grammar symbols, indexed by symbol id.
+
+        Returns None
+        """
+
+        super().__init__(symbol_names)
+        self.state = array('i')
+        self.size = array('i')
+
+        # number of nodes when the tree was built or last compacted
+        self.compacted_size = 0
+
+    def add_leaf(self, symbol, value, state):
+        """ Adds a leaf as ParseTree.add_leaf, parsed from state.  Returns
+        the number of the new node.
+        """
+
+        self.state.append(state)
+        self.size.append(0 if value is None else 1)
+        return super().add_leaf(symbol, value)
+
+    def add_node(self, symbol, children, state):
+        """ Adds an interior node as ParseTree.add_node, parsed from state.
+        Returns the number of the new node.
+        """
+
+        size = self.size
+        self.state.append(state)
+        size.append(sum(size[child] for child in children))
+        return super().add_node(symbol, children)
+
+    def compact(self, root):
+        """ Copies the tree under root, without the nodes of older trees.
+
+        Parameters:
+        root: int
+            Root of the tree to copy.
+
+        Returns: (IncrementalTree, int)
+            The new tree and the number of its root.
+        """
+
+        tree = IncrementalTree(self.symbol_names)
+        symbol, value, values, state = self.symbol, self.value, self.values, self.state
+        first_child, child_count, children = self.first_child, self.child_count, self.children
+
+        # copy the nodes in post-order, so children are numbered before parents
+        copied = {}
+        stack = [(root, False)]
+        while stack:
+            node, expanded = stack.pop()
+            first = first_child[node]
+            kids = children[first: first + child_count[node]]
+            if not kids:
+                copied[node] = tree.add_leaf(symbol[node], values[value[node]] if value[node] >= 0 else None,
+                                             state[node])
+            elif expanded:
+                copied[node] = tree.add_node(symbol[node], [copied[child] for child in kids], state[node])
+            else:
+                stack.append((node, True))
+                stack.extend((child, False) for child in reversed(kids))
+
+        tree.compacted_size = len(tree)
+        return tree, copied[root]
+
+
+class Document:
+    """ A parsed source text, as returned by IncrementalParser.
+
+    tokens is the lex.TokenTable of the source text, tokens.text, and the
+    parse tree is the tree under node root of tree.
+    """
+
+    def __init__(self, tokens, tree, root):
+        self.tokens = tokens
+        self.tree = tree
+        self.root = root
+
+    @property
+    def text(self):
+        return self.tokens.text
+
+    def preorder(self):
+        """ Returns the parse tree as a list of labels in depth-first,
+        pre-order, as returned by Parser.parse.
+        """
+
+        return self.tree.preorder(self.root)
+
+
+class IncrementalParser:
+    """ Parses source texts into Documents, and parses the Documents
+    again after edits, reusing the unchanged parts of their parse trees.
+    """
+
+    def __init__(self, parser):
+        """ Initializes an incremental parser.
+
+        Parameters:
+        parser: Parser
+            Compiled parser of the grammar.  Its lexer scans the text and
+            the action and goto dictionaries of its states drive the parse,
+            whichever tables it was created with.
+
+        Returns None
+        """
+
+        self.parser = parser
+
+        # epsilon rule each state falls back to when no action applies, as in Parser.events_dict
+        self.epsilon_rule = []
+        for state in parser.states:
+            rule_number = -1
+            for item in state.items:
+                if item.rule.rhs[0] == parser.epsilon:
+                    rule_number = item.rule.rule_number
+                    break
+            self.epsilon_rule.append(rule_number)
+
+    def parse(self, text):
+        """ Parses a source text.
+
+        Parameters:
+        text: string
+            The source.
+
+        Returns: Document
+            The document of the text, whose preorder is the list returned
+            by Parser.parse.
+
+        Exceptions raised:
+
+        lex.InvalidToken and SourceFileSyntaxError, as for Parser.parse.
+        """
+
+        stats = self.parser.stats
+        if stats is not None:
+            start = time.perf_counter()
+
+        tokens = self.parser.lexer.scan(text)
+        tree = IncrementalTree(self.parser.symbol_names)
+        root = self.parse_tokens(tree, tokens)
+        tree.compacted_size = len(tree)
+
+        if stats is not None:
+            stats.add_time("parse", time.perf_counter() - start)
+            stats.count("parses")
+        return Document(tokens, tree, root)
+
+    def reparse(self, document, edits):
+        """ Parses a document again after edits to its text.
+
+        Parameters:
+        document: Document
+            The document before the edits.  It is not changed, and can
+            still be used or reparsed afterwards.
+
+        edits: list of (start, end, text)
+            Each edit replaces the characters from offset start up to end
+            with text.  The edits are applied in order, and the offsets of
+            each are those of the text after the edits before it.
+
+        Returns: Document
+            The document of the edited text, as parse would return it.
+
+        Exceptions raised:
+
+        lex.InvalidToken and SourceFileSyntaxError, as for Parser.parse.
+        """
+
+        stats = self.parser.stats
+        if stats is not None:
+            started = time.perf_counter()
+
+        lexer = self.parser.lexer
+        tokens = document.tokens.copy()
+
+        # the old tokens from changed up to changed_old were replaced by the
+        # new tokens from changed up to changed_new, all others are unchanged
+        changed = None
+        for start, end, insert in edits:
+            first, last, following = lexer.relex(tokens, start, end, insert)
+            if changed is None:
+                changed, changed_old, changed_new = first, last, following
+            else:
+                union_end = max(changed_new, last)
+                changed_old = union_end - (changed_new - changed_old)
+                changed_new = union_end + following - last
+                changed = min(changed, first)
+
+        tree, root = document.tree, document.root
+        if changed is not None:
+            if len(tree) > COMPACT_RATIO * tree.compacted_size:
+                tree, root = tree.compact(root)
+            root = self.parse_tokens(tree, tokens, (root, changed, changed_old, changed_new))
+
+        if stats is not None:
+            stats.add_time("reparse", time.perf_counter() - started)
+            stats.count("reparses")
+        return Document(tokens, tree, root)
+
+    def parse_tokens(self, tree, tokens, reuse=None):
+        """ Parses a token stream, adding the nodes of its parse tree to tree.
+
+        Parameters:
+        tree: IncrementalTree
+            Tree the new nodes are added to.
+
+        tokens: lex.TokenTable
+            The tokens to parse.
+
+        reuse: tuple or None
+            (root, changed, changed_old, changed_new) to reuse the subtrees
+            of the old tree under node root of tree.  The old tokens from
+            changed up to changed_old were replaced by the tokens from
+            changed up to changed_new, and all other tokens are the same,
+            those after the change shifted by changed_new - changed_old.
+            None parses without reusing anything.
+
+        Returns: int
+            The root of the parse tree.
+
+        Exceptions raised:
+
+        SourceFileSyntaxError, if the tokens are not a sentence of the grammar.
+        """
+
+        parser = self.parser
+        states = parser.states
+        rules = parser.rules
+        symbol_ids, symbol_names = parser.symbol_ids, parser.symbol_names
+        rule_symbols, rule_lengths = parser.rule_symbols, parser.rule_lengths
+        epsilon_rule = self.epsilon_rule
+        epsilon_id = symbol_ids[parser.epsilon]
+        end_of_input = parser.end_of_input
+        add_leaf, add_node = tree.add_leaf, tree.add_node
+        node_state, node_size = tree.state, tree.size
+        node_symbol = tree.symbol
+        first_child, child_count, children = tree.first_child, tree.child_count, tree.children
+
+        # old subtrees still to be passed, as (node, number of its first
+        # old token), the leftmost on top
+        if reuse is None:
+            cursor = []
+            changed = changed_old = changed_new = len(tokens)
+        else:
+            root, changed, changed_old, changed_new = reuse
+            cursor = [(root, 0)]
+        shift = changed_new - changed_old
+        reused = reused_tokens = 0
+
+        state_stack = [0]
+        node_stack = []
+        types, names = tokens.types, tokens.names
+        count = len(types)
+        i = 0
+        while True:
+            state = state_stack[-1]
+
+            # find the largest old subtree starting at token i that lies
+            # outside the change and is followed by the same token as before
+            candidate = -1
+            if cursor and (i < changed or i >= changed_new):
+                position = i if i < changed else i - shift
+                while cursor:
+                    node, start = cursor[-1]
+                    end = start + node_size[node]
+                    if end <= position:
+                        cursor.pop()
+                        continue
+                    if start > position:
+                        break
+                    first, kids = first_child[node], child_count[node]
+                    if start == position and (end < changed or start >= changed_old):
+                        candidate = node
+                        break
+                    if not kids:
+                        break
+
+                    # the node spans the change or starts before token i, split it into its children
+                    cursor.pop()
+                    for child in reversed(children[first: first + kids]):
+                        end -= node_size[child]
+                        cursor.append((child, end))
+
+            if candidate >= 0 and node_state[candidate] == state and child_count[candidate]:
+                # the subtree parses the same from this state, push it whole
+                cursor.pop()
+                node_stack.append(candidate)
+                state_stack.append(states[state].goto[symbol_names[node_symbol[candidate]]])
+                i += node_size[candidate]
+                reused += 1
+                reused_tokens += node_size[candidate]
+                continue
+
+            if i < count:
+                if types[i] < 0:
+                    raise InvalidToken
+                token_type = names[types[i]]
+            else:
+                token_type = end_of_input
+            action = states[state].action.get(token_type)
+
+            if action is None:
+                # no action, fall back to an epsilon rule of the state
+                rule_number = epsilon_rule[state]
+                if rule_number < 0:
+                    raise SourceFileSyntaxError
+                children_nodes = [add_leaf(epsilon_id, None, state)]
+
+            elif action[0] == "shift":
+                if candidate >= 0:
+                    node, start = cursor.pop()
+                    if child_count[node]:
+                        # the subtree was parsed from another state, try its children instead
+                        first, end = first_child[node], start + node_size[node]
+                        for child in reversed(children[first: first + child_count[node]]):
+                            end -= node_size[child]
+                            cursor.append((child, end))
+                        continue
+                    if node_state[node] == state:
+                        # an unchanged token shifted from the same state keeps its leaf
+                        node_stack.append(node)
+                        state_stack.append(action[1])
+                        i += 1
+                        continue
+                node_stack.append(add_leaf(symbol_ids[token_type], tokens.value(i), state))
+                state_stack.append(action[1])
+                i += 1
+                continue
+
+            elif action[0] == "reduce":
+                rule_number = action[1]
+                length = rule_lengths[rule_number]
+                if length:
+                    children_nodes = node_stack[-length:]
+                    del node_stack[-length:]
+                    del state_stack[-length:]
+                else:
+                    children_nodes = [add_leaf(epsilon_id, None, state_stack[-1])]
+
+            else:
+                # accept
+                break
+
+            left_state = state_stack[-1]
+            goto_state = states[left_state].goto.get(rules[rule_number].lhs)
+            if goto_state is None:
+                raise SourceFileSyntaxError
+            node_stack.append(add_node(rule_symbols[rule_number], children_nodes, left_state))
+            state_stack.append(goto_state)
+
+        if parser.stats is not None:
+            parser.stats.count("reused_subtrees", reused)
+            parser.stats.count("reused_tokens", reused_tokens)
+        return node_stack[-1]
+
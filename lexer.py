@@ -16,7 +16,33 @@ the name of a source text file. The primary method, next_token, scans the
 source file and returns the subsequent token based on the provided specifications.
 """
 
-from regex import RegEx
+import os
+import re
+import copy
+import mmap
+import time
+from array import array
+from bisect import bisect_left
+from regex import RegEx, regex_cache
+from nfa import NFA
+from dfa import CompiledDFA
+from cache import cache_path, load_cache, save_cache
+from stats import Stats
+
+# number of characters read from the source at a time
+BUFFER_SIZE = 65536
+
+# bump when the layout of cached scanners changes
+CACHE_VERSION = 1
+
+# whitespace separated words of a source text
+WORD = re.compile(r'\S+')
+
+# first character of the next word
+NON_WHITESPACE = re.compile(r'\S')
+
+# bytes that separate words, those whose latin-1 character is whitespace to str.split
+WHITESPACE_BYTES = bytes(b for b in range(256) if chr(b).isspace())
 
 class InvalidToken(Exception):
 	""" 
@@ -27,24 +53,201 @@ class InvalidToken(Exception):
 	"""
 	pass
 
+def read_chunks(source, buffer_size=BUFFER_SIZE):
+	"""
+	Yields the text of source in chunks.  source may be the
+	name of a file, an open file object, or an iterable of strings.
+	Files are read buffer_size characters at a time.
+	"""
+
+	# file name, open it and read it as a file object
+	if isinstance(source, (str, os.PathLike)):
+		with open(source, 'r') as f:
+			yield from read_chunks(f, buffer_size)
+
+	# file object, read through a fixed size buffer
+	elif hasattr(source, 'read'):
+		while True:
+			chunk = source.read(buffer_size)
+			if not chunk:
+				break
+			yield chunk
+
+	# iterable of chunks
+	else:
+		yield from source
+
+class MappedSource:
+	"""
+	A source file mapped into memory, scanned by Lex.spans without 
+	reading it into Python strings.  data is a memoryview of its bytes,
+	and the characters of the token alphabet are matched as the bytes of
+	their latin-1 codes.  The text of a token is decoded only when value
+	is called.  The file stays mapped until close is called, or the end
+	of a with block.
+	"""
+
+	def __init__(self, filename, encoding='latin-1'):
+		self.encoding = encoding
+		self.file = open(filename, 'rb')
+
+		# an empty file cannot be mapped
+		if os.fstat(self.file.fileno()).st_size == 0:
+			self.mmap = None
+			self.data = memoryview(b'')
+		else:
+			self.mmap = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+			self.data = memoryview(self.mmap)
+
+	def value(self, start, end):
+		""" Returns the text of the bytes from offset start up to end. """
+
+		return str(self.data[start: end], self.encoding)
+
+	def close(self):
+		self.data.release()
+		if self.mmap is not None:
+			self.mmap.close()
+		self.file.close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc_info):
+		self.close()
+
+class TokenTable:
+	"""
+	The tokens of a source text and their offsets, built by Lex.scan and
+	kept up to date with edits of the text by Lex.relex.
+
+	Token i has type names[types[i]], or the type id -1 for the rest of a
+	word that does not start with a valid token.  Its text is 
+	text[start(i): end(i)], and extent(i) is the offset just past the last
+	character the scanner read to find it: the character (or the end of 
+	the word) that stopped the token, or an earlier one where the DFA 
+	died.  The token can change only if the text before its extent does.
+	Every token is scanned from the start state of the scanner, so the
+	start of any token is a safe point to restart scanning from.
+
+	The offsets of the tokens before index gap are stored from the start
+	of the text, and those of the others from its end, so an edit changes
+	the stored offsets of the tokens rescanned and of the tokens between it
+	and the edit before, not of every token after it.
+	"""
+
+	def __init__(self, text, names):
+		self.text = text
+		self.names = names
+		self.types = array('i')
+		self.starts = array('q')
+		self.ends = array('q')
+		self.extents = array('q')
+		self.gap = 0
+
+	def __len__(self):
+		return len(self.types)
+
+	def copy(self):
+		""" Returns a copy of the table, which can be edited separately. """
+
+		table = TokenTable(self.text, self.names)
+		table.types = array('i', self.types)
+		table.starts = array('q', self.starts)
+		table.ends = array('q', self.ends)
+		table.extents = array('q', self.extents)
+		table.gap = self.gap
+		return table
+
+	def offset(self, i):
+		""" Returns what is added to the stored offsets of token i. """
+
+		return 0 if i < self.gap else len(self.text)
+
+	def start(self, i):
+		return self.starts[i] + self.offset(i)
+
+	def end(self, i):
+		return self.ends[i] + self.offset(i)
+
+	def extent(self, i):
+		return self.extents[i] + self.offset(i)
+
+	def type(self, i):
+		""" Returns the type of token i, None if it is not a valid token. """
+
+		type_id = self.types[i]
+		return self.names[type_id] if type_id >= 0 else None
+
+	def value(self, i):
+		""" Returns the text of token i. """
+
+		return self.text[self.start(i): self.end(i)]
+
+	def find(self, offset):
+		""" Returns the index of the first token starting at or after offset. """
+
+		gap = self.gap
+		if gap and self.starts[gap - 1] >= offset:
+			return bisect_left(self.starts, offset, 0, gap)
+		return bisect_left(self.starts, offset - len(self.text), gap)
+
+	def move_gap(self, gap):
+		""" Stores the offsets of the tokens before index gap from the start
+		of the text, and of the others from its end.
+		"""
+
+		length = len(self.text)
+		if gap < self.gap:
+			low, high, shift = gap, self.gap, -length
+		else:
+			low, high, shift = self.gap, gap, length
+		if low < high:
+			for offsets in (self.starts, self.ends, self.extents):
+				offsets[low: high] = array('q', [offset + shift for offset in offsets[low: high]])
+		self.gap = gap
+
 class Lex:
-	def __init__(self, regex_file, source_file):
+	def __init__(self, regex_file, source_file=None, buffer_size=BUFFER_SIZE, cache_dir=None, stats=None):
 		"""
 		Initializes a lexical analyzer.  regex_file
 		contains specifications of the types of tokens
 		(see problem assignment for format), and source_file
-		is the text file that tokens are returned from.
+		is the text that tokens are returned from.  source_file
+		may be a file name, an open file object, or an iterable
+		of strings, and is read lazily buffer_size characters 
+		at a time.
+
+		If cache_dir is given, the compiled scanner is saved there,
+		keyed by a hash of the contents of regex_file, and later 
+		lexers for the same specification load it instead of 
+		compiling the token regexes again.  Within a process the 
+		scanner is shared through regex_cache, keyed by the alphabet
+		and token patterns, so lexers for the same tokens build it 
+		once, and only a lexer that misses regex_cache reads or 
+		writes cache_dir.
+
+		stats may be a Stats object, or True for a new one, in which the
+		lexer records the time spent compiling the scanner, the DFA state
+		counts and the number of tokens scanned.  The minimized DFA of 
+		each token is built (or taken from regex_cache) only to count its
+		states, and that time is recorded as the phase "token_dfas", not
+		as "lex_compile".  It is kept in self.stats,
+		which is None when stats are off.
 		"""
 
-		regex_f = open(regex_file, 'r')
+		self.stats = Stats() if stats is True else stats or None
+
+		spec = open(regex_file, 'r').read()
+		lines = spec.splitlines()
 
 		# save alphabet as list
-		alphabet_line = regex_f.readline()
+		alphabet_line = lines[0] if lines else ''
 		self.alphabet = list(alphabet_line[alphabet_line.find('"') + 1: alphabet_line.rfind('"')])
 
 		# iterate through lines with tokens to build dict
 		self.tokens_dict = {}
-		for line in regex_f:
+		for line in lines[1:]:
 
 			token = line.strip().split(" ")
 
@@ -56,48 +259,436 @@ class Lex:
 			# add "token_name: token_regex" to dict
 			self.tokens_dict[token[0]] = regex
 
-		# save split source file and current index for next_token
-		source_f = open(source_file, 'r').read()
-		self.source = [word for line in source_f.splitlines() for word in line.split()]
-		self.current_index = 0
+		# token types numbered in the order of the regex file, for token tables
+		self.token_types = list(self.tokens_dict)
+		self.token_ids = {token_type: i for i, token_type in enumerate(self.token_types)}
+
+		# combine every token regex into a single tagged DFA, shared through the
+		# regex cache by lexers with the same tokens, or loaded from the disk cache
+		if self.stats is not None:
+			start = time.perf_counter()
+		self.scanner = regex_cache.scanner(self.alphabet, self.tokens_dict.items(),
+			lambda: self.load_scanner(spec, cache_dir))
+
+		if self.stats is not None:
+			self.stats.add_time("lex_compile", time.perf_counter() - start)
+			self.stats.count("scanner_states", self.scanner.num_states)
+
+			# the DFA of each token is only built for its state count, so it is timed apart from the scanner
+			start = time.perf_counter()
+			for token_type, regex in self.tokens_dict.items():
+				self.stats.token_dfa_states[token_type] = regex.compile().num_states
+			self.stats.add_time("token_dfas", time.perf_counter() - start)
+
+		# tokens are scanned lazily as next_token is called
+		self.buffer_size = buffer_size
+		self.reset(source_file)
+
+	def reset(self, source_file):
+		"""
+		Starts scanning tokens from source_file, which may be a file 
+		name, an open file object, an iterable of strings, a 
+		MappedSource, or None for an empty source.
+		"""
+
+		if isinstance(source_file, MappedSource):
+			self.source = source_file
+			self.token_stream = ((token_type, source_file.value(start, end))
+				for token_type, start, end in self.spans(source_file))
+		else:
+			if source_file is None:
+				self.source = iter(())
+			else:
+				self.source = read_chunks(source_file, self.buffer_size)
+			self.token_stream = self.tokens()
+		if self.stats is not None:
+			self.token_stream = self.counted_tokens(self.token_stream)
+
+	def for_source(self, source_file):
+		"""
+		Returns a new lexer scanning source_file that shares the 
+		compiled scanner of this one, so no token regex is compiled 
+		again.
+		"""
+
+		lexer = copy.copy(self)
+		lexer.reset(source_file)
+		return lexer
+
+	def __getstate__(self):
+		"""
+		Pickles the compiled scanner without the source being scanned,
+		so a lexer can be sent to another process.  The unpickled lexer
+		scans an empty source until reset.
+		"""
+
+		state = self.__dict__.copy()
+		del state["source"]
+		del state["token_stream"]
+		return state
+
+	def __setstate__(self, state):
+		self.__dict__.update(state)
+		self.reset(None)
 		
-	def next_token(self):
+	def load_scanner(self, spec, cache_dir):
+		"""
+		Returns the CompiledDFA of the token specification spec, loaded
+		from cache_dir if it was saved there, and otherwise built and 
+		saved there.  With no cache_dir it is always built.
+		"""
 
-		# no more tokens in the source file, raise EOFError
-		if len(self.source) == 0:
-			raise EOFError
+		if cache_dir is None:
+			return self.build_scanner()
+
+		path = cache_path(cache_dir, "lex", spec, CACHE_VERSION)
+		cached = load_cache(path, CACHE_VERSION)
+		if cached is not None:
+			try:
+				return CompiledDFA.from_dict(cached)
+			except (ValueError, KeyError, TypeError):
+				pass
+
+		scanner = self.build_scanner()
+		save_cache(path, CACHE_VERSION, scanner.to_dict())
+		return scanner
+
+	def build_scanner(self):
+		"""
+		Returns a CompiledDFA recognizing the union of all token regexes.  Each
+		accepting state of the DFA is tagged with the token it recognizes,
+		and when several tokens accept the same string, the one listed
+		first in the regex file wins.
+		"""
+
+		# new start state 0 with an epsilon to the start of every token NFA
+		combined_nfa = NFA()
+		combined_nfa.alphabet = [char for char in self.alphabet if char != 'e']
+		combined_nfa.start_st = 0
+		combined_nfa.transitions[0] = []
+		combined_nfa.accept_sts = []
+
+		# remember which token (and its priority) each accept state belongs to
+		accept_tokens = {}
+		for priority, (name, regex) in enumerate(self.tokens_dict.items()):
+			token_nfa = regex.to_nfa()
+			combined_nfa.transitions.update(token_nfa.transitions)
+			combined_nfa.transitions[0].append(('e', token_nfa.start_st))
+			combined_nfa.accept_sts += token_nfa.accept_sts
+			combined_nfa.num_states += token_nfa.num_states
 
+			for state in token_nfa.accept_sts:
+				accept_tokens.setdefault(state, (priority, name))
+
+		combined_nfa.num_states += 1
+
+		return combined_nfa.to_DFA(accept_tokens).minimize().compile()
+
+	def match(self, text, start):
+		"""
+		Returns (token_type, end) for the longest token starting at
+		index start of text, where end is the index just past the token.
+		token_type is None if no token matches.
+		"""
+
+		token_type, end, _ = self.match_extent(text, start)
+		return token_type, end
+
+	def match_extent(self, text, start):
+		"""
+		Returns (token_type, end, extent) as match, where extent is the 
+		index just past the last character of text the scanner read, 
+		len(text) + 1 if it reached the end of text.
+		"""
+
+		codes = self.scanner.codes
+		table = self.scanner.table
+		accept_tokens = self.scanner.accept_tokens
+		k = self.scanner.alphabet_size
+
+		state = self.scanner.start
 		token_type = None
-		token_value = None
-		max_length = 0
+		end = start
+
+		# single left-to-right pass, remembering the last accepting state
+		i = start
+		while state >= 0 and i < len(text):
+			code = codes.get(text[i])
+			if code is None:
+				break
+			state = table[state * k + code]
+			i += 1
+
+			if state >= 0 and accept_tokens[state] is not None:
+				token_type = accept_tokens[state]
+				end = i
+
+		# the character that stopped the scan was read too, unless the DFA died on the last one
+		return token_type, end, i if state < 0 else i + 1
+
+	def tokens(self):
+		"""
+		Yields (token_type, token_value) for every token in the source.
+		Raises InvalidToken if the remaining characters of a word do not
+		start with a valid token.
+
+		The scanner runs across the chunks of the source, without 
+		splitting it into words.  Besides the current chunk, only the
+		characters read since the start of the token being scanned are
+		held in memory: a longest match is not known until the scanner's
+		DFA dies, so a run of characters that keeps the DFA alive is 
+		held until it does, however long it is.  The chunks of that run
+		are joined once the DFA dies, and dropped as their tokens are
+		yielded, or when InvalidToken is raised.
+		"""
+
+		table = self.scanner.table
+		accept_tokens = self.scanner.accept_tokens
+		k = self.scanner.alphabet_size
+		start_state = self.scanner.start
+
+		# whitespace ends a token, whether or not it is in the alphabet
+		codes = {char: code for char, code in self.scanner.codes.items() if not char.isspace()}
+
+		chunks = self.source
+		text = ''
+		start = 0
+		while True:
+
+			# skip to the start of the next word, reading chunks as needed
+			if start == len(text) or text[start].isspace():
+				found = NON_WHITESPACE.search(text, start)
+				if found is None:
+					text = next(chunks, None)
+					if text is None:
+						return
+					start = 0
+					continue
+				start = found.start()
+
+			# longest match starting at start, as in match_extent.  Earlier
+			# chunks the scan reads past are kept in pieces, and offset is
+			# that of text[0] from the start of the token.
+			state = start_state
+			token_type = None
+			end = 0
+			pieces = []
+			offset = -start
+			i = start
+			length = len(text)
+			while True:
+				while state >= 0 and i < length:
+					code = codes.get(text[i])
+					if code is None:
+						break
+					state = table[state * k + code]
+					i += 1
+
+					if state >= 0 and accept_tokens[state] is not None:
+						token_type = accept_tokens[state]
+						end = offset + i
+
+				# the scan stopped inside the chunk, or the token may go on in the next one
+				if state < 0 or i < length:
+					break
+				chunk = next(chunks, None)
+				if chunk is None:
+					break
+				pieces.append(text[start:] if not pieces else text)
+				offset += length
+				text = chunk
+				length = len(text)
+				i = 0
+
+			# if not token, raise invalid
+			if token_type is None:
+				raise InvalidToken
 
-		#if self.current_index < len(self.source):
-		current_token = self.source[0]
+			# a token spanning chunks is joined once, with the rest of the chunk it ends in
+			if pieces:
+				pieces.append(text)
+				text = ''.join(pieces)
+				start = 0
 
-		for name, regex in self.tokens_dict.items():
-			
-			for i in range(self.current_index, len(current_token) + 1):
+			yield (token_type, text[start: start + end])
+			start += end
 
-				# simulate regex on substring
-				if regex.simulate(current_token[self.current_index: i]) and (i - self.current_index > max_length):
-					# if longest match
-					token_type = name
-					token_value = current_token[self.current_index: i]
-					max_length = i - self.current_index
+	def spans(self, source):
+		"""
+		Yields (token_type, start, end) for every token of source, a 
+		MappedSource or a bytes-like object, where start and end are the
+		offsets of its bytes.  The scanner runs directly over a 
+		memoryview of the bytes, from a ByteDFA with a row of 256 
+		entries per state, so no part of the source is copied.  The 
+		ByteDFA is built once on the compiled scanner, and shared by 
+		every lexer from for_source.  Raises InvalidToken, as tokens does, if the
+		rest of a word does not start with a valid token.
+		"""
+
+		# whitespace ends a token, as the word splitting of tokens does
+		byte_scanner = self.scanner.to_bytes(WHITESPACE_BYTES)
+
+		data = source.data if isinstance(source, MappedSource) else memoryview(source)
+		rows = byte_scanner.rows
+		accept_tokens = byte_scanner.accept_tokens
+		start_state = byte_scanner.start
+		whitespace = WHITESPACE_BYTES
+		length = len(data)
+
+		start = 0
+		while start < length:
+			if data[start] in whitespace:
+				start += 1
+				continue
+
+			if start_state < 0:
+				raise InvalidToken
+
+			# longest match starting at start, as in match
+			row = rows[start_state]
+			token_type = None
+			end = i = start
+			while i < length:
+				state = row[data[i]]
+				if state < 0:
+					break
+				i += 1
+				row = rows[state]
+				if accept_tokens[state] is not None:
+					token_type = accept_tokens[state]
+					end = i
+
+			if token_type is None:
+				raise InvalidToken
+
+			yield (token_type, start, end)
+			start = end
 
-		# moving to the next token
-		if max_length == len(current_token) - self.current_index:
-			self.source.pop(0)
-			self.current_index = 0
+	def scan_tokens(self, text, start):
+		"""
+		Yields (type_id, start, end, extent) for every token of text from
+		offset start on, which must not be inside a token, with the ids
+		and offsets of a TokenTable.  The rest of a word that does not 
+		start with a valid token is yielded with type id -1 instead of
+		raising InvalidToken.
+		"""
+
+		token_ids = self.token_ids
+		for found in WORD.finditer(text, start):
+			word = found.group()
+			offset = found.start()
+			position = 0
+			while position < len(word):
+				token_type, end, extent = self.match_extent(word, position)
+				if token_type is None:
+					yield (-1, offset + position, offset + len(word), offset + len(word) + 1)
+					break
+				yield (token_ids[token_type], offset + position, offset + end, offset + extent)
+				position = end
 
+	def scan(self, text):
+		"""
+		Returns a TokenTable of the tokens of the string text.
+		"""
+
+		table = TokenTable(text, self.token_types)
+		for token in self.scan_tokens(text, 0):
+			table.types.append(token[0])
+			table.starts.append(token[1])
+			table.ends.append(token[2])
+			table.extents.append(token[3])
+		table.gap = len(table.types)
+
+		if self.stats is not None:
+			self.stats.count("tokens_scanned", len(table))
+		return table
+
+	def relex(self, table, start, end, text):
+		"""
+		Replaces the characters of table.text from offset start up to end
+		with text, and rescans only the tokens the edit can change.
+
+		Scanning restarts at the first token whose extent reaches past
+		start, or at start if there is none, and stops at the first new 
+		token that starts where an old token after the edit started, as 
+		that token and every one after it scan the same as before.
+
+		Returns: (first, last, new_last)
+			The old tokens first up to last were replaced by the tokens
+			first up to new_last.  The tokens after them are the same,
+			with their offsets shifted by the change of length of the text.
+		"""
+
+		if not 0 <= start <= end <= len(table.text):
+			raise ValueError(f"Edit ({start}, {end}) is outside the text")
+
+		# restart at the earliest token of the word before the edit whose scan read into it
+		first = table.find(start)
+		restart = start
+		i = first - 1
+		while i >= 0:
+			if table.extent(i) > start:
+				first = i
+				restart = table.start(i)
+			elif i + 1 == len(table) or table.end(i) != table.start(i + 1):
+				break
+			i -= 1
+
+		# old tokens from last on start after the edit
+		last = table.find(end)
+		delta = len(text) - (end - start)
+		new_text = table.text[:start] + text + table.text[end:]
+
+		types, starts, ends, extents = array('i'), array('q'), array('q'), array('q')
+		for token in self.scan_tokens(new_text, restart):
+			while last < len(table) and table.start(last) + delta < token[1]:
+				last += 1
+			if last < len(table) and table.start(last) + delta == token[1]:
+				break
+			types.append(token[0])
+			starts.append(token[1])
+			ends.append(token[2])
+			extents.append(token[3])
 		else:
-			self.current_index += max_length
+			last = len(table)
 
-		# if not token, raise invalid
-		if token_type is None:
-			raise InvalidToken
+		# the tokens after the edit keep their offsets from the end of the text
+		table.move_gap(last)
+		table.types[first: last] = types
+		table.starts[first: last] = starts
+		table.ends[first: last] = ends
+		table.extents[first: last] = extents
+		table.gap = first + len(types)
+		table.text = new_text
 
-		return (token_type, token_value)
+		if self.stats is not None:
+			self.stats.count("tokens_relexed", len(types))
+		return first, last, first + len(types)
+
+	def counted_tokens(self, tokens):
+		"""
+		Yields the tokens of the generator tokens, adding their number
+		to the tokens_scanned counter of self.stats when it finishes.
+		"""
+
+		count = 0
+		try:
+			for token in tokens:
+				count += 1
+				yield token
+		finally:
+			self.stats.count("tokens_scanned", count)
+
+	def __iter__(self):
+		return self.token_stream
+
+	def next_token(self):
+
+		# no more tokens in the source file, raise EOFError
+		try:
+			return next(self.token_stream)
+		except StopIteration:
+			raise EOFError
 		
 # You will likely add other classes, drawn from code from your previous 
 # assignments.
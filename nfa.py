@@ -40,11 +40,11 @@ class NFA:
                     break
 
             self.start_st = int(f.readline().strip())
-            self.accept_sts = (f.readline().strip().split())
+            self.accept_sts = [int(state) for state in f.readline().strip().split()]
             
             return
 
-    def to_DFA(self):
+    def to_DFA(self, accept_tokens=None):
         """
         Converts the "self" NFA into an equivalent DFA object
         and returns that DFA.  The DFA object should be an
@@ -56,105 +56,99 @@ class NFA:
         This function should not read in the NFA file again.  It should
         create the DFA from the internal representation of the NFA that you
         created in __init__.
-        """
 
-        def find_epsilons(from_state):
-            queue = deque([from_state])
-            results = set()
-
-            while queue:
-                # Get the next state to process
-                current_state = queue.pop()
-                if current_state != from_state:
-                    results.add(current_state)
-
-                # If the current state has an 'e' transition, add its 'e' transition states to the queue
-                if current_state in self.transitions:
-                    for char, next_state in self.transitions[current_state]:
-                        if char == 'e' and next_state not in results:
-                            queue.append(next_state)
-            
-            return list(results)
+        accept_tokens is an optional dictionary mapping accept states of
+        the NFA to (priority, token) pairs.  When given, every accepting
+        state of the DFA is tagged in the DFA's accept_tokens dictionary
+        with the token of lowest priority among the NFA states it contains.
+        """
 
+        # split transitions into epsilons and moves grouped by symbol
+        epsilon_moves = {}
+        symbol_moves = {}
+        for state, pairs in self.transitions.items():
+            for char, next_state in pairs:
+                if char == 'e':
+                    epsilon_moves.setdefault(state, []).append(next_state)
+                else:
+                    symbol_moves.setdefault(state, {}).setdefault(char, []).append(next_state)
+
+        # epsilon closure of each nfa state, computed once
+        closures = {}
+        def find_closure(from_state):
+            if from_state not in closures:
+                results = {from_state}
+                stack = [from_state]
+                while stack:
+                    for next_state in epsilon_moves.get(stack.pop(), ()):
+                        if next_state not in results:
+                            results.add(next_state)
+                            stack.append(next_state)
+                closures[from_state] = frozenset(results)
+            return closures[from_state]
+
+        accept_sts = set(self.accept_sts)
         def find_accepts(from_states):
-            for state in from_states:
-                if (state) in self.accept_sts:
-                    converted_dfa.accept_states.add(converted_dfa.num_states)
+            if not accept_sts.isdisjoint(from_states):
+                converted_dfa.accept_states.add(converted_dfa.num_states)
+
+            # tag the new state with the highest priority token it accepts
+            if accept_tokens:
+                tags = [accept_tokens[state] for state in from_states if state in accept_tokens]
+                if tags:
+                    converted_dfa.accept_tokens[converted_dfa.num_states] = min(tags)[1]
 
-        # initialize dfa values
+        # initialize dfa values, 'e' is epsilon and never an input symbol
         converted_dfa = dfa.DFA()
-        converted_dfa.alphabet = self.alphabet
+        converted_dfa.alphabet = [char for char in self.alphabet if char != 'e']
 
         # set reject state (1) to loop on all chars
-        for char in self.alphabet:
+        for char in converted_dfa.alphabet:
             converted_dfa.transitions[(1, char) ] = 1
 
-        # map start state to 2
+        # map start state to 2, dfa states are keyed by their subset of nfa states
         converted_dfa.start_state = 2
-        state_map = {2: [self.start_st]}
         converted_dfa.num_states = 2
-
-        # find all epsilons from start state
-        state_map[2] += find_epsilons(self.start_st)
+        start_subset = find_closure(self.start_st)
+        state_map = {start_subset: 2}
 
         # find if start state is an accept state
-        find_accepts(state_map[2])
+        find_accepts(start_subset)
 
         # create queue with start state
-        queue = deque([2])
+        queue = deque([start_subset])
 
         while queue:
 
-            current_state = queue.pop()
+            substates = queue.pop()
+            current_state = state_map[substates]
 
-            # get nfa states from mapping
-            substates = state_map[current_state]
+            # group the moves out of the subset by symbol
+            next_by_char = {}
+            for state in substates:
+                for char, next_states in symbol_moves.get(state, {}).items():
+                    next_by_char.setdefault(char, set()).update(next_states)
 
             # check where every char transitions to from nfa states
-            for char in self.alphabet:
-
-                # add all possible transitions to array
-                next_states = []
-                for state in substates:
-                    # if no transitions for state, add nothing to array
-                    try:
-                        next_states += [tup[1] for tup in self.transitions[state] if tup[0] == char]
-                        # for state in next state
-                            # if state has epsilon trans
-                                # add epsilon to next_state also
-                    except:
-                        next_states += []
-
-                for state in next_states:
-                    next_states += find_epsilons(state)
-
-                if next_states:
-
-                    # remove duplicates and sort subset
-                    next_states = list(set(next_states))
-                    state_mapped = False
-
-					# if subset already defined by new state
-                    for key, val in state_map.items():
-                        if next_states == val:
-                            converted_dfa.transitions[((current_state), char) ] = (key)
-                            state_mapped = True
-                    
-                    if not state_mapped:
-
-                        # if subset not defined set to next state
-                        converted_dfa.num_states += 1
-                        converted_dfa.transitions[((current_state), char) ] = (converted_dfa.num_states)
-
-                        # set accept states if they are in subset
-                        find_accepts(next_states)
-
-                        # map subset to int state and add to queue
-                        state_map[converted_dfa.num_states] = next_states
-                        queue.append(converted_dfa.num_states)
+            for char in converted_dfa.alphabet:
 
                 # if no transitions, send to reject state (1)
-                else:
-                    converted_dfa.transitions[((current_state), char) ] = 1
+                if char not in next_by_char:
+                    converted_dfa.transitions[(current_state, char)] = 1
+                    continue
+
+                # add states reachable by epsilons
+                next_subset = frozenset().union(*[find_closure(state) for state in next_by_char[char]])
+
+                # if subset not defined set to next state
+                if next_subset not in state_map:
+                    converted_dfa.num_states += 1
+                    state_map[next_subset] = converted_dfa.num_states
+
+                    # set accept states if they are in subset
+                    find_accepts(next_subset)
+                    queue.append(next_subset)
+
+                converted_dfa.transitions[(current_state, char)] = state_map[next_subset]
 
         return converted_dfa
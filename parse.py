@@ -14,7 +14,18 @@ the definition of an 'Item' class, which represents individual rules within the
 larger system for grammar analysis and parsing in computational linguistics or compiler design.
 """
 
+import time
+from array import array
 from lexer import InvalidToken, Lex
+from cache import cache_path, load_cache, save_cache
+from stats import Stats
+
+# bump when the layout of cached parse tables changes
+PARSE_TABLE_VERSION = 1
+
+# kinds of the events yielded by Parser.events
+SHIFT = "shift"
+REDUCE = "reduce"
 
 # Exception classes defined for the project.
 class NonLRGrammarError(Exception):
@@ -71,17 +82,22 @@ class Item:
 class State:
     """ Represents a single state in the LR Automaton. """
 
-    def __init__(self, items):
+    def __init__(self, items, kernel=None):
         """ Initializes a state of the LR Automaton.
         
         Parameters:
         items: set of Item
             The set of items that defines the state.
+        kernel: frozenset of int or None
+            The codes (see Parser.intern_items) of the items the state 
+            was built from, before taking their closure.
 
         Returns None
         """
 
         self.items = items
+        self.kernel = kernel
+        self.transitions = {} # Index of the state reached on each grammar symbol.
         self.action = {} # Dictionary telling what action to take from
         # the "self" state, given the next terminal in the input.  terminal can
         # also be the end of input symbol.  You will fill in this dictionary later.  
@@ -123,13 +139,138 @@ class Rule:
         self.lhs = lhs 
         self.rhs = rhs
     
+class ParseTables:
+    """ Integer coded action and goto tables, compressed by row displacement.
+
+    Terminals and nonterminals are numbered from 0.  Actions are encoded
+    as ints: s + 1 shifts to state s, -(r + 1) reduces by rule r, and the
+    accept action is -1 (a reduction by the dummy start rule 0).  0 means
+    no action.  
+
+    Each row of a table is stored in one shared vector at offset base[state],
+    so the entry for column c of state s is value[base[s] + c] if 
+    check[base[s] + c] == s, and empty otherwise.  Rows are placed at the 
+    first offset where their entries fall in unused slots (a comb vector),
+    so the tables take space close to the number of defined entries.
+    """
+
+    def __init__(self, parser):
+        """ Builds the compressed tables from the states of parser.
+
+        Parameters:
+        parser: Parser
+            Parser whose states, rules and symbol sets are encoded.
+
+        Returns None
+        """
+
+        self.terminals = sorted(parser.terminals)
+        self.nonterminals = sorted(parser.nonterminals)
+        self.terminal_ids = {terminal: i for i, terminal in enumerate(self.terminals)}
+        self.nonterminal_ids = {nonterminal: i for i, nonterminal in enumerate(self.nonterminals)}
+
+        # Rule lhs ids and rhs lengths, epsilon rules have length 0
+        self.rule_lhs = array('i', [self.nonterminal_ids[rule.lhs] for rule in parser.rules])
+        self.rule_length = array('i', [len(parser.rhs_symbols(rule)) for rule in parser.rules])
+
+        # Encode each state's actions and gotos as sparse rows
+        action_rows = []
+        goto_rows = []
+        self.epsilon_rule = array('i', [-1]) * len(parser.states)
+        for i, state in enumerate(parser.states):
+            row = {}
+            for terminal, action in state.action.items():
+                if action[0] == 'shift':
+                    row[self.terminal_ids[terminal]] = action[1] + 1
+                elif action[0] == 'reduce':
+                    row[self.terminal_ids[terminal]] = -(action[1] + 1)
+                else:
+                    row[self.terminal_ids[terminal]] = -1
+            action_rows.append(row)
+            goto_rows.append({self.nonterminal_ids[var]: target for var, target in state.goto.items()})
+
+            # Epsilon rule the parser falls back to when no action applies
+            for item in state.items:
+                if item.rule.rhs[0] == parser.epsilon:
+                    self.epsilon_rule[i] = item.rule.rule_number
+                    break
+
+        self.action_base, self.action_check, self.action_value = self.compress(action_rows, len(self.terminals))
+        self.goto_base, self.goto_check, self.goto_value = self.compress(goto_rows, len(self.nonterminals))
+
+    def compress(self, rows, num_columns):
+        """ Packs sparse rows into base, check and value arrays.
+
+        Parameters:
+        rows: list of dict
+            Row i maps column numbers to the (nonzero) entries of row i.
+        num_columns: int
+            Number of columns of the table.
+
+        Returns: (base, check, value)
+            The arrays described in the class docstring.  check and value 
+            are padded so base[s] + c is always a valid index.
+        """
+
+        base = array('i', [0]) * len(rows)
+        check = array('i')
+        value = array('i')
+        used = bytearray()  # 1 for the slots taken by some row
+        first_free = 0
+
+        # Place the densest rows first, they are the hardest to fit
+        for i in sorted(range(len(rows)), key=lambda i: -len(rows[i])):
+            columns = sorted(rows[i])
+            if not columns:
+                continue
+
+            # First offset where every entry of the row lands in a free slot.
+            # Only offsets putting the first entry in a free slot are tried,
+            # and bytearray.find skips over the taken slots.
+            slot = used.find(0, max(first_free, columns[0]))
+            while True:
+                if slot == -1:
+                    slot = max(len(used), columns[0])
+                offset = slot - columns[0]
+                if all(offset + c >= len(used) or not used[offset + c] for c in columns[1:]):
+                    break
+                slot = used.find(0, slot + 1)
+
+            needed = offset + columns[-1] + 1 - len(check)
+            if needed > 0:
+                check.extend([-1] * needed)
+                value.extend([0] * needed)
+                used.extend(bytes(needed))
+            for c in columns:
+                check[offset + c] = i
+                value[offset + c] = rows[i][c]
+                used[offset + c] = 1
+            base[i] = offset
+
+            first_free = used.find(0, first_free)
+            if first_free == -1:
+                first_free = len(used)
+
+        # Pad so that every lookup stays in range
+        padding = max(base, default=0) + num_columns - len(check)
+        if padding > 0:
+            check.extend([-1] * padding)
+            value.extend([0] * padding)
+
+        return base, check, value
+
 class Parser:
     """ Manages parsing of an input file, given the grammar
         specification, and the specification of the terminals 
         of the grammar.
+
+        The token DFAs and parse tables are built once, in __init__.  A
+        Parser created without a source file acts as a compiled grammar
+        whose parse method can be called on any number of sources.
     """
 
-    def __init__(self, lexer_filename, grammar_filename, source_filename):
+    def __init__(self, lexer_filename, grammar_filename, source_filename=None, cache_dir=None, method="slr",
+                 tables="dict", stats=False):
         """ Initializes the Parser object.
         
         Parameters:
@@ -142,8 +283,37 @@ class Parser:
             Name of file containing specification of the grammar.  (Format
             of this file is specified in pa5 problem statement.)
 
-        source_filename: string
-            Name of the file containing the input to the parser.
+        source_filename: string or None
+            Name of the file containing the input to the parser.  May be
+            None, in which case a source is given to each call to parse.
+
+        cache_dir: string or None
+            Directory caching the compiled lexer and parse tables, keyed by
+            the contents of the tokens and grammar files.  When the tables 
+            for a grammar are found there, they are loaded instead of 
+            computing first, follow and the LR automaton again.
+
+        method: string
+            "slr" to take the lookaheads of reduce actions from the follow
+            sets, or "lalr" to compute LALR(1) lookaheads.  Both build the
+            same LR(0) automaton, but LALR(1) accepts more grammars.
+
+        tables: string
+            "dict" to parse from the action and goto dictionaries of the 
+            states, or "compressed" to parse from integer coded, row 
+            displacement compressed ParseTables.
+
+        The seconds spent in each phase of building the parser are kept in
+        the timings dictionary, keyed by phase name: "lexer", "load" (for
+        tables found in the cache), "grammar", "first", "follow", "lr0", 
+        "lalr", "actions" and "compress".
+
+        stats: bool or Stats
+            True (or a Stats object to record into) to keep self.stats, a
+            Stats holding the phase timings, the numbers of LR states, items
+            and closures, the lexer's stats, and for every parse its time
+            and the numbers of shifts and reductions.  self.stats is None
+            when stats are off, and nothing is counted.
         """
 
         self.end_of_input = "END_OF_INPUT"
@@ -152,24 +322,154 @@ class Parser:
         self.epsilon = "eps"  # An epsilon rule in the grammar must have this as its rhs.
         self.accept_action = "accept"
 
-        try:
-            # Create lexical analyzer.  Use code from pa4 for this.
-            self.lexer = Lex(lexer_filename, source_filename)
+        if method not in ("slr", "lalr"):
+            raise ValueError(f"Unknown parse table method {method}")
+        self.method = method
 
-            # Read the grammar file.
-            self.terminals, self.nonterminals, self.rules, self.rules_by_lhs = \
-                self.read_grammar_file(grammar_filename)
+        if tables not in ("dict", "compressed"):
+            raise ValueError(f"Unknown parse table backend {tables}")
+        self.tables = tables
+        self.parse_tables = None
+        self.timings = {}
+        self.stats = Stats() if stats is True else stats or None
 
-            # Compute first and follow functions for the input grammar.
-            self.first = self.compute_first()
-            self.follow = self.compute_follow()
-
-            # Compute the parse table for the grammar.
-            self.states = self.compute_parse_table_states()
+        try:
+            # Create lexical analyzer.  Use code from pa4 for this.
+            phase_start = time.perf_counter()
+            self.lexer = Lex(lexer_filename, source_filename, cache_dir=cache_dir, stats=self.stats)
+            self.timings["lexer"] = time.perf_counter() - phase_start
+
+            # Load the parse tables from the cache if they were computed before.
+            cached = None
+            if cache_dir is not None:
+                try:
+                    grammar = open(grammar_filename).read()
+                except FileNotFoundError:
+                    raise FileNotFoundError(f"Could not open grammar file {grammar_filename}")
+                path = cache_path(cache_dir, "parse", f"{method}\n{grammar}", PARSE_TABLE_VERSION)
+                cached = load_cache(path, PARSE_TABLE_VERSION)
+
+            # A corrupted cache entry is ignored, and the tables are built again.
+            if cached is not None:
+                phase_start = time.perf_counter()
+                try:
+                    self.load_parse_tables(cached)
+                    self.timings["load"] = time.perf_counter() - phase_start
+                except (KeyError, TypeError, ValueError, IndexError):
+                    cached = None
+
+            if cached is None:
+                # Read the grammar file.
+                phase_start = time.perf_counter()
+                self.terminals, self.nonterminals, self.rules, self.rules_by_lhs = \
+                    self.read_grammar_file(grammar_filename)
+                self.intern_items()
+                self.timings["grammar"] = time.perf_counter() - phase_start
+
+                # Compute first and follow functions for the input grammar.
+                phase_start = time.perf_counter()
+                self.first = self.compute_first()
+                self.timings["first"] = time.perf_counter() - phase_start
+
+                phase_start = time.perf_counter()
+                self.follow = self.compute_follow()
+                self.timings["follow"] = time.perf_counter() - phase_start
+
+                # Compute the parse table for the grammar.  A non-LR grammar
+                # is cached too, so it is reported without rebuilding the tables.
+                try:
+                    self.states = self.compute_parse_table_states()
+                except NonLRGrammarError:
+                    if cache_dir is not None:
+                        save_cache(path, PARSE_TABLE_VERSION, {"error": "NonLRGrammarError"})
+                    raise
+
+                if cache_dir is not None:
+                    save_cache(path, PARSE_TABLE_VERSION, self.dump_parse_tables())
+
+            # Number the grammar symbols for parse tree nodes
+            self.number_symbols()
+
+            # Encode the tables as compressed integer arrays.
+            if tables == "compressed":
+                phase_start = time.perf_counter()
+                self.parse_tables = ParseTables(self)
+                self.timings["compress"] = time.perf_counter() - phase_start
+
+            if self.stats is not None:
+                for phase, seconds in self.timings.items():
+                    self.stats.add_time(phase, seconds)
+                self.stats.count("states", len(self.states))
+                self.stats.count("items", sum(len(state.items) for state in self.states))
         
         except InvalidToken:
             print(f"Invalid token while processing input file {source_filename}")
 
+    def dump_parse_tables(self):
+        """ Returns the grammar, first and follow sets and parse table states 
+        as a dictionary that can be written out as JSON.
+
+        Returns: dict
+            Dictionary read back by load_parse_tables.
+        """
+
+        return {
+            "terminals": sorted(self.terminals),
+            "nonterminals": sorted(self.nonterminals),
+            "rules": [[rule.rule, rule.lhs, list(rule.rhs)] for rule in self.rules],
+            "first": [[key if isinstance(key, str) else list(key), sorted(value)] 
+                      for key, value in self.first.items()],
+            "follow": {key: sorted(value) for key, value in self.follow.items()},
+            "states": [{
+                "items": sorted([item.rule.rule_number, item.dot_pos] for item in state.items),
+                "action": {terminal: list(action) for terminal, action in state.action.items()},
+                "goto": state.goto,
+            } for state in self.states],
+        }
+
+    def load_parse_tables(self, tables):
+        """ Restores the grammar, first and follow sets and parse table states 
+        from a dictionary returned by dump_parse_tables.
+
+        Parameters:
+
+        tables: dict
+            Dictionary returned by dump_parse_tables.
+
+        Exceptions raised:
+
+        NonLRGrammarError, if the cached grammar was found not to be LR.
+        """
+
+        if "error" in tables:
+            raise NonLRGrammarError
+
+        self.terminals = set(tables["terminals"])
+        self.nonterminals = set(tables["nonterminals"])
+
+        # Rebuild the rules, rule 0 is the dummy start rule
+        self.rules = []
+        self.rules_by_lhs = {}
+        for rule_number, (rule, lhs, rhs) in enumerate(tables["rules"]):
+            rule = Rule(rule, rule_number, lhs, tuple(rhs))
+            self.rules.append(rule)
+            self.rules_by_lhs.setdefault(lhs, set()).add(rule)
+        self.dummy_rule = self.rules[0]
+        self.intern_items()
+
+        self.first = {key if isinstance(key, str) else tuple(key): set(value) 
+                      for key, value in tables["first"]}
+        self.follow = {key: set(value) for key, value in tables["follow"].items()}
+
+        # Rebuild the states with their items and actions
+        self.states = []
+        for cached_state in tables["states"]:
+            state = State({self.item_table[rule_number * self.item_stride + dot_pos]
+                           for rule_number, dot_pos in cached_state["items"]})
+            state.action = {terminal: tuple(action) for terminal, action in cached_state["action"].items()}
+            state.goto = dict(cached_state["goto"])
+            self.states.append(state)
+
     def read_grammar_file(self, grammar_filename):
         """ Reads the grammar file, initializing instance variables associated with the grammar.
         
@@ -294,6 +594,41 @@ class Parser:
 
         return Rule(rule, rule_number, tokens[0], tokens[2:])
 
+    def compute_nullable(self):
+        """
+        Compute the set of nonterminals that derive the empty string.
+        Each rule counts the symbols of its rhs not yet known to be
+        nullable, and each newly nullable nonterminal decrements the counts
+        of the rules using it, so every rhs symbol is visited once.
+
+        Returns: set
+            The nullable nonterminals.
+        """
+
+        # Rules using each symbol, once per occurrence on the rhs
+        uses = {}
+        remaining = []
+        nullable = set()
+        worklist = []
+        for rule in self.rules:
+            rhs = self.rhs_symbols(rule)
+            remaining.append(len(rhs))
+            for symbol in rhs:
+                uses.setdefault(symbol, []).append(rule)
+            if not rhs and rule.lhs not in nullable:
+                nullable.add(rule.lhs)
+                worklist.append(rule.lhs)
+
+        while worklist:
+            symbol = worklist.pop()
+            for rule in uses.get(symbol, ()):
+                remaining[rule.rule_number] -= 1
+                if remaining[rule.rule_number] == 0 and rule.lhs not in nullable:
+                    nullable.add(rule.lhs)
+                    worklist.append(rule.lhs)
+
+        return nullable
+
     def compute_first(self):
         """
         Compute first dictionary for all grammar symbols, and for
@@ -301,6 +636,11 @@ class Parser:
         in a rule.
         Assumes epsilon only appears in a rule of the form X -> epsilon.
 
+        first(X) holds the terminals starting a rhs of X after a nullable
+        prefix, united with first(Y) for each nonterminal Y found there.
+        That relation is solved once with digraph, instead of passing over
+        the rules until nothing changes.
+
         Returns: dict
             key is string that is any terminal, nonterminal, or any 
             substring of a rule rhs following a nonterminal in the rule rhs.
@@ -309,44 +649,44 @@ class Parser:
         """
         # Initialize
         first = {}
-        for nonterminal in self.nonterminals:
-            first[nonterminal] = set()
         for terminal in self.terminals:
             first[terminal] = {terminal}
 
-        # Compute first for all nonterminals
-        
-        # Handle rules of the form X -> epsilon
+        nullable = self.compute_nullable()
+
+        # Terminals each nonterminal starts with directly, and the 
+        # nonterminals whose first sets it includes
+        direct = {nonterminal: set() for nonterminal in self.nonterminals}
+        relation = {nonterminal: [] for nonterminal in self.nonterminals}
         for rule in self.rules:
-            if rule.rhs[0] == self.epsilon:
-                first[rule.lhs].add(self.epsilon)
+            for symbol in self.rhs_symbols(rule):
+                if symbol in self.nonterminals:
+                    relation[rule.lhs].append(symbol)
+                    if symbol not in nullable:
+                        break
+                else:
+                    direct[rule.lhs].update(first[symbol])
+                    break
 
-        # Handle other rules.  Keep going until all rules
-        # are processed without adding anything to first for a nonterminal.
-        while True:
-            updated = False
-            # Check every rule
-            for rule in self.rules:
-                # Skip epsilon rules
-                if rule.rhs[0] == self.epsilon:
-                    continue
+        first_sets = self.digraph(sorted(self.nonterminals), relation, direct)
+        for nonterminal in self.nonterminals:
+            first[nonterminal] = set(first_sets[nonterminal])
+            if nonterminal in nullable:
+                first[nonterminal].add(self.epsilon)
 
-                first_of_rhs = self.first_of_substring(first, rule.rhs)
-                if not first_of_rhs.issubset(first[rule.lhs]):
-                    updated = True
-                    first[rule.lhs].update(first_of_rhs)
-      
-            if not updated:
-                # All done
-                break
-                
         # Compute first for all strings of grammar symbols that follow a nonterminal
-        # in a rule
+        # in a rule.  Suffixes are built right to left, each from the one after it.
         for rule in self.rules:
-            for i in range(len(rule.rhs) - 1):
-                if rule.rhs[i] in self.nonterminals:
-                    str = rule.rhs[i+1:]
-                    first[str] = self.first_of_substring(first, str)
+            rhs = rule.rhs
+            suffix_first = {self.epsilon}
+            for i in range(len(rhs) - 1, 0, -1):
+                symbol_first = first[rhs[i]]
+                if self.epsilon in symbol_first:
+                    suffix_first = (symbol_first - {self.epsilon}) | suffix_first
+                else:
+                    suffix_first = set(symbol_first)
+                if rhs[i-1] in self.nonterminals:
+                    first[rhs[i:]] = set(suffix_first)
 
         # Return first
         return first
@@ -393,6 +733,10 @@ class Parser:
     def compute_follow(self):
         """ Compute and return follow dictionary for all nonterminals in the grammar.
 
+        follow(X) holds the first terminals of what comes after X in each
+        rule, united with follow of the lhs when that remainder is nullable.
+        As for first, the relation is solved once with digraph.
+
         Returns: dict
             key is nonterminal in the grammar.
             value is the set of terminal symbols that can follow 
@@ -400,58 +744,56 @@ class Parser:
         """
 
         # Initialize
-        follow = {}
-        for nonterminal in self.nonterminals:
-            follow[nonterminal] = set()
-        follow[self.dummy_start_symbol].add(self.end_of_input)
+        direct = {nonterminal: set() for nonterminal in self.nonterminals}
+        direct[self.dummy_start_symbol].add(self.end_of_input)
+        relation = {nonterminal: [] for nonterminal in self.nonterminals}
 
-        # Compute follow for all nonterminals
-
-        # Keep adding terminals to follow until no more can be added
-        while True:
-            updated = False
-            for rule in self.rules:
-                for i in range(len(rule.rhs) - 1):
-                    symbol = rule.rhs[i]
-                    if symbol in self.nonterminals:
-                        remainder = rule.rhs[i+1:]
-                        first_remainder = self.first[remainder]
-                        for terminal in first_remainder:
-                            if terminal != self.epsilon and terminal not in follow[symbol]:
-                                follow[symbol].add(terminal)
-                                updated = True
-                        if self.epsilon in first_remainder:
-                            for terminal in follow[rule.lhs]:
-                                if terminal not in follow[symbol]:
-                                    follow[symbol].add(terminal)
-                                    updated = True
-
-                # Handle last symbol on rhs
-                symbol = rule.rhs[-1]
-                if symbol in self.nonterminals:
-                    for terminal in follow[rule.lhs]:
-                        if terminal not in follow[symbol]:
-                            follow[symbol].add(terminal)
-                            updated = True
+        # Terminals following each nonterminal directly, and the lhs
+        # whose follow sets it includes
+        for rule in self.rules:
+            rhs = self.rhs_symbols(rule)
+            for i, symbol in enumerate(rhs):
+                if symbol not in self.nonterminals:
+                    continue
+                if i + 1 < len(rhs):
+                    first_remainder = self.first[rhs[i+1:]]
+                    direct[symbol].update(first_remainder)
+                    direct[symbol].discard(self.epsilon)
+                    if self.epsilon not in first_remainder:
+                        continue
+                relation[symbol].append(rule.lhs)
 
-            if not updated:
-                # all done
-                break
+        follow_sets = self.digraph(sorted(self.nonterminals), relation, direct)
 
         # All done. Return follow dictionary
-        return follow
+        return {nonterminal: set(follow_sets[nonterminal]) for nonterminal in self.nonterminals}
     
     def compute_parse_table_states(self):
-        """ Generate the LR parsing table states """
+        """ Generate the LR parsing table states 
+        
+        The states are those of the LR(0) automaton.  Reduce actions are
+        added for the terminals in the follow set of the rule's lhs (SLR),
+        or for the LALR(1) lookaheads of the item when self.method is "lalr".
 
-        # Set up the initial state based on the first rule
-        start_items = {Item(self.rules[0], 0)}
-        start_state = State(self.items_closure(start_items))
-        states = [start_state]
+        Returns: list of State
+            The states, with their action and goto dictionaries filled in.
 
-        i = 0
-        while i < len(states):
-            current_state = states[i]
+        Exceptions raised:
+
+        NonLRGrammarError, if two actions conflict in some state.
+        """
+
+        phase_start = time.perf_counter()
+        states = self.compute_lr0_states()
+        self.timings["lr0"] = time.perf_counter() - phase_start
+
+        if self.method == "lalr":
+            phase_start = time.perf_counter()
+            lookaheads = self.compute_lalr_lookaheads(states)
+            self.timings["lalr"] = time.perf_counter() - phase_start
+
+        phase_start = time.perf_counter()
+        for i, current_state in enumerate(states):
 
             # Check for the acceptance condition in the current state
             for rule_item in current_state.items:
@@ -460,75 +802,287 @@ class Parser:
                         raise NonLRGrammarError
                     current_state.action[self.end_of_input] = ('accept',)
 
-            # Prepare for transitions based on the items
-            transition_dict = {}
+            # Handle reduce actions
             for rule_item in current_state.items:
-                if rule_item.dot_pos < len(rule_item.rule.rhs):
-                    next_symbol = rule_item.rule.rhs[rule_item.dot_pos]
-                    transition_dict.setdefault(next_symbol, []).append(rule_item)
-
-                # Handle reduce actions
+                if self.method == "lalr":
+                    if rule_item.dot_pos != len(self.rhs_symbols(rule_item.rule)):
+                        continue
+                    follow_set = lookaheads.get((i, rule_item.rule.rule_number), ())
                 elif rule_item.dot_pos == len(rule_item.rule.rhs):
                     follow_set = self.follow[rule_item.rule.lhs]
-                    for terminal in follow_set:
-                        if terminal != 'eps':
-                            if terminal in current_state.action:
-                                existing_action = current_state.action[terminal]
-                                if existing_action[0] != 'accept':
-                                    raise NonLRGrammarError
-                            else:
-                                current_state.action[terminal] = ('reduce', rule_item.rule.rule_number)
+                else:
+                    continue
+
+                for terminal in follow_set:
+                    if terminal != 'eps':
+                        if terminal in current_state.action:
+                            existing_action = current_state.action[terminal]
+                            if existing_action[0] != 'accept':
+                                raise NonLRGrammarError
+                        else:
+                            current_state.action[terminal] = ('reduce', rule_item.rule.rule_number)
 
             # Process each symbol for state transitions
-            for symbol, items in transition_dict.items():
+            for symbol, state_transition_index in current_state.transitions.items():
                 if symbol in current_state.action or symbol in current_state.goto:
                     raise NonLRGrammarError
 
-                updated_items = {Item(it.rule, it.dot_pos + 1) for it in items}
-                closed_items = self.items_closure(updated_items)
+                if symbol in self.terminals:
+                    current_state.action[symbol] = ('shift', state_transition_index)
+                elif symbol not in ('eps', self.end_of_input):
+                    current_state.goto[symbol] = state_transition_index
 
-                # Check if this forms a new state or an existing one
-                existing_state_idx = self.get_state_index(closed_items, states)
-                if existing_state_idx is not None:
-                    if symbol in self.terminals:
-                        current_state.action[symbol] = ('shift', existing_state_idx)
-                    elif symbol not in ('eps', self.end_of_input):
-                        current_state.goto[symbol] = existing_state_idx
-                else:
-                    new_parsing_state = State(closed_items)
-                    states.append(new_parsing_state)
-                    state_transition_index = len(states) - 1
-                    if symbol in self.terminals:
-                        current_state.action[symbol] = ('shift', state_transition_index)
-                    elif symbol not in ('eps', self.end_of_input):
-                        current_state.goto[symbol] = state_transition_index
+        self.timings["actions"] = time.perf_counter() - phase_start
+
+        return states
+
+    def intern_items(self):
+        """ Number the items of the grammar and precompute the closure of
+        each nonterminal.
+
+        The item with the dot at dot_pos in rule r has the code 
+        r * self.item_stride + dot_pos.  self.item_table maps each code to
+        its one Item object, self.item_symbol to the symbol after the dot
+        (None when the dot is at the end), and self.closure_items maps each
+        nonterminal X to the frozenset of codes of the items added by the
+        closure of an item with the dot before X.
+        """
+
+        self.item_stride = max(len(rule.rhs) for rule in self.rules) + 1
+        self.item_table = [None] * (len(self.rules) * self.item_stride)
+        self.item_symbol = [None] * len(self.item_table)
+        for rule in self.rules:
+            code = rule.rule_number * self.item_stride
+            for dot_pos in range(len(rule.rhs) + 1):
+                self.item_table[code + dot_pos] = Item(rule, dot_pos)
+                if dot_pos < len(rule.rhs):
+                    self.item_symbol[code + dot_pos] = rule.rhs[dot_pos]
+
+        # The closure of X holds the rules of X, and the closure of each
+        # nonterminal those rules start with
+        initial = {}
+        relation = {}
+        for nonterminal, rules in self.rules_by_lhs.items():
+            initial[nonterminal] = frozenset(rule.rule_number * self.item_stride for rule in rules)
+            relation[nonterminal] = [rule.rhs[0] for rule in rules if rule.rhs[0] in self.rules_by_lhs]
+        self.closure_items = self.digraph(sorted(self.rules_by_lhs), relation, initial)
+
+    def compute_lr0_states(self):
+        """ Build the states of the LR(0) automaton.
+
+        The states are built from item codes (see intern_items), and the
+        items of each state are turned into Item objects once it is known.
+
+        Returns: list of State
+            The states, with the transitions dictionary of each filled in
+            and empty action and goto dictionaries.
+        """
+
+        # Set up the initial state based on the first rule
+        start_kernel = frozenset({0})
+        kernels = [start_kernel]
+        transitions = []
 
+        # Index of the state built from each kernel.  Distinct kernels always
+        # close to distinct item sets, so goto targets are found by hashing
+        # the kernel, and the closure is only computed for new states.
+        state_index = {start_kernel: 0}
+
+        i = 0
+        while i < len(kernels):
+            # Close the kernel with the precomputed closures
+            codes = self.items_closure(kernels[i])
+
+            # Prepare for transitions based on the items
+            transition_dict = {}
+            for code in codes:
+                next_symbol = self.item_symbol[code]
+                if next_symbol is not None:
+                    transition_dict.setdefault(next_symbol, []).append(code + 1)
+
+            # Find or create the state reached on each symbol
+            state_transitions = {}
+            for symbol, next_codes in transition_dict.items():
+                kernel = frozenset(next_codes)
+
+                state_transition_index = state_index.get(kernel)
+                if state_transition_index is None:
+                    state_transition_index = len(kernels)
+                    kernels.append(kernel)
+                    state_index[kernel] = state_transition_index
+
+                state_transitions[symbol] = state_transition_index
+
+            transitions.append((codes, state_transitions))
             i += 1
 
+        states = []
+        for kernel, (codes, state_transitions) in zip(kernels, transitions):
+            state = State({self.item_table[code] for code in codes}, kernel)
+            state.transitions = state_transitions
+            states.append(state)
         return states
 
-        
+    def rhs_symbols(self, rule):
+        """ Returns the symbols on the rhs of rule, an empty tuple for an epsilon rule. """
+
+        if rule.rhs[0] == self.epsilon:
+            return ()
+        return rule.rhs
+
+    def compute_lalr_lookaheads(self, states):
+        """ Compute LALR(1) lookaheads with the DeRemer and Pennello relations.
+
+        Parameters:
+
+        states: list of State
+            States of the LR(0) automaton, from compute_lr0_states.
+
+        Returns: dict
+            key is (state index, rule number) for a state containing the
+            completed item of the rule (an epsilon rule is completed with 
+            the dot at 0).
+            value is the set of terminals on which to reduce by the rule.
+        """
+
+        nullable = {symbol for symbol in self.nonterminals if self.epsilon in self.first[symbol]}
+
+        # Sets of terminals are propagated as int bitsets
+        terminal_list = sorted(self.terminals)
+        terminal_bits = {terminal: 1 << bit for bit, terminal in enumerate(terminal_list)}
+
+        # Nonterminal transitions (p, A) of the automaton
+        nonterminal_transitions = [(p, symbol) for p, state in enumerate(states)
+                                   for symbol in state.transitions if symbol in self.nonterminals]
+
+        # DR(p, A): terminals shifted right after the transition.  The state
+        # reached on the start symbol also reads the end of input.
+        direct_reads = {}
+        reads = {}
+        for p, symbol in nonterminal_transitions:
+            r = states[p].transitions[symbol]
+            bits = 0
+            for t in states[r].transitions:
+                if t in self.terminals:
+                    bits |= terminal_bits[t]
+            if any(item.rule.rule_number == 0 and item.dot_pos == 1 for item in states[r].items):
+                bits |= terminal_bits[self.end_of_input]
+            direct_reads[(p, symbol)] = bits
+
+            # (p, A) reads (r, C) for nullable C
+            reads[(p, symbol)] = [(r, c) for c in states[r].transitions if c in nullable]
+
+        # includes and lookback, by walking each rule from every state it starts in
+        includes = {transition: [] for transition in nonterminal_transitions}
+        lookback = {}
+        for p, symbol in nonterminal_transitions:
+            for rule in self.rules_by_lhs[symbol]:
+                rhs = self.rhs_symbols(rule)
+                q = p
+                for j, rhs_symbol in enumerate(rhs):
+                    if rhs_symbol in self.nonterminals and all(x in nullable for x in rhs[j+1:]):
+                        includes[(q, rhs_symbol)].append((p, symbol))
+                    q = states[q].transitions[rhs_symbol]
+                lookback.setdefault((q, rule.rule_number), []).append((p, symbol))
+
+        read_sets = self.digraph(nonterminal_transitions, reads, direct_reads)
+        follow_sets = self.digraph(nonterminal_transitions, includes, read_sets)
+
+        lookaheads = {}
+        for key, transitions in lookback.items():
+            bits = 0
+            for transition in transitions:
+                bits |= follow_sets[transition]
+            lookaheads[key] = {terminal for terminal in terminal_list if bits & terminal_bits[terminal]}
+        return lookaheads
+
+    def digraph(self, nodes, relation, initial):
+        """ Computes F(x) = initial[x] united with F(y) for every y related to x,
+        with the SCC based algorithm of DeRemer and Pennello.
+
+        Parameters:
+
+        nodes: list
+            The nodes of the relation.
+
+        relation: dict
+            Maps each node to the list of nodes it is related to.
+
+        initial: dict
+            Maps each node to its initial set.  Sets may be anything
+            combined with |, such as int bitsets.
+
+        Returns: dict
+            Maps each node to its set F(x).
+        """
+
+        result = {}
+        depth = {node: 0 for node in nodes}
+        stack = []
+        done = len(nodes) + 1  # depth of nodes whose set is final
+
+        for node in nodes:
+            if depth[node] != 0:
+                continue
+
+            # Iterative depth first traversal, each entry is (node, children, depth)
+            stack.append(node)
+            depth[node] = len(stack)
+            result[node] = initial[node]
+            work = [(node, iter(relation.get(node, ())), len(stack))]
+
+            while work:
+                x, children, d = work[-1]
+                descended = False
+                for y in children:
+                    if depth[y] == 0:
+                        stack.append(y)
+                        depth[y] = len(stack)
+                        result[y] = initial[y]
+                        work.append((y, iter(relation.get(y, ())), len(stack)))
+                        descended = True
+                        break
+                    depth[x] = min(depth[x], depth[y])
+                    result[x] = result[x] | result[y]
+                if descended:
+                    continue
+
+                # x is finished, pop its strongly connected component
+                work.pop()
+                if depth[x] == d:
+                    while True:
+                        top = stack.pop()
+                        depth[top] = done
+                        result[top] = result[x]
+                        if top == x:
+                            break
+
+                if work:
+                    parent = work[-1][0]
+                    depth[parent] = min(depth[parent], depth[x])
+                    result[parent] = result[parent] | result[x]
+
+        return result
+
     def goto(self, state, symbol):
         """ Gets the set of items to transition to from a state in the LR automaton.
 
         Parameters:
 
-        state: int
-            The state being transitioned from.
+        state: State
+            The state being transitioned from, one of self.states.
 
         symbol: string
             The grammar symbol (terminal or nonterminal) being transitioned on.
 
         Returns: set of Item
-            The set of items that will define the state to transition to. 
+            The set of items that will define the state to transition to,
+            empty if there is no transition on symbol.
         """
 
-        goto_items = set()
-        for item in state.items:
-            if item.dot_pos < len(item.rule.rhs) and symbol == item.rule.rhs[item.dot_pos]:
-                goto_items.add(Item(item.rule, item.dot_pos + 1))
-        goto_items = self.items_closure(goto_items)
-        return goto_items
+        if symbol not in state.transitions:
+            return set()
+        return self.states[state.transitions[symbol]].items
     
     def get_state_index(self, items, states):
         """ Get index of state that contains the specified items.
@@ -551,40 +1105,38 @@ class Parser:
                 return i
         return None
 
-    def items_closure(self, items):
-        """ Updates set of items to contain the closure of itself.
+    def items_closure(self, codes):
+        """ Computes the closure of a set of items.
 
         Parameters:
 
-        items: set of Item
-            The set of items to compute the closure of.
+        codes: iterable of int
+            The codes (see intern_items) of the items to compute the closure of.
 
-        Returns: set of Item
-            Returns the closure of the set of items.
+        Returns: set of int
+            The codes of the items in the closure of the set of items.
         """
 
-        # Keep adding new items until no more items are added.
-        while True:
-            new_items = set()
-            for item in items:
-                rule = item.rule
-                rhs = rule.rhs
-                dot_pos = item.dot_pos
-                if dot_pos < len(rhs) and rhs[dot_pos] in self.nonterminals:
-                    nonterminal = rhs[dot_pos]
-                    for rule in self.rules_by_lhs[nonterminal]:
-                        item = Item(rule, 0)
-                        if item not in items:
-                            new_items.add(item)
-            if not new_items:
-                break
-            else:
-                items.update(new_items)
-        return items
+        if self.stats is not None:
+            self.stats.count("closures")
+
+        # Add the precomputed closure of each nonterminal after a dot
+        closure = set(codes)
+        for code in list(closure):
+            nonterminal_closure = self.closure_items.get(self.item_symbol[code])
+            if nonterminal_closure is not None:
+                closure |= nonterminal_closure
+        return closure
     
-    def parse(self):
+    def parse(self, source=None):
         """ Parse the source file.
 
+        Parameters:
+
+        source: string, file object, iterable of strings, or None
+            Source to parse with the already compiled tables.  If None,
+            the source file given to __init__ is parsed.
+
         Returns: list
             Returns the parse tree for the source file, returned as a list generated
             by visiting the nodes of the parse tree in depth-first, pre-order fashion.
@@ -603,16 +1155,177 @@ class Parser:
         if the method detects that the next input token is valid for the grammar.
         """
 
-        # Get states from parse table
-        table_states = self.compute_parse_table_states()
+        return self.parse_tree(source).preorder()
+
+    def parse_tree(self, source=None):
+        """ Parse the source file into a ParseTree.
+
+        Parameters:
+
+        source: string, file object, iterable of strings, or None
+            As for parse.
+
+        Returns: ParseTree
+            The parse tree of the source.  Its preorder method gives the 
+            list returned by parse.
+
+        Exceptions raised:
+
+        As for parse.
+        """
+
+        if self.stats is None:
+            return self.build_tree(self.events(source))
+
+        start = time.perf_counter()
+        try:
+            return self.build_tree(self.events(source))
+        finally:
+            self.stats.add_time("parse", time.perf_counter() - start)
+            self.stats.count("parses")
+
+    def parse_events(self, source=None, shift=None, reduce=None):
+        """ Parse the source file without building a tree, calling shift
+        and reduce for each step of the parse.
+
+        Parameters:
+
+        source: string, file object, iterable of strings, or None
+            As for parse.
+
+        shift: callable or None
+            Called as shift(token) with the (token_type, token_value)
+            tuple of each token shifted.
+
+        reduce: callable or None
+            Called as reduce(rule_number, lhs) for each reduction, including
+            the reductions by epsilon rules.
+
+        Exceptions raised:
+
+        As for parse.
+        """
+
+        if self.stats is not None:
+            start = time.perf_counter()
+        try:
+            for event in self.events(source):
+                if event[0] == SHIFT:
+                    if shift is not None:
+                        shift(event[1])
+                elif reduce is not None:
+                    reduce(event[1], event[2])
+        finally:
+            if self.stats is not None:
+                self.stats.add_time("parse", time.perf_counter() - start)
+                self.stats.count("parses")
+
+    def events(self, source=None):
+        """ Parse the source file without building a tree.
+
+        Parameters:
+
+        source: string, file object, iterable of strings, or None
+            As for parse.
+
+        Returns: generator
+            Yields (SHIFT, token) for each token shifted, where token is the
+            (token_type, token_value) tuple, and (REDUCE, rule_number, lhs)
+            for each reduction, in the order the parser performs them.  Only
+            the stack of states is kept, so memory is bounded by the depth
+            of the stack rather than the size of the source.
+
+        Exceptions raised:
+
+        As for parse, raised when the generator reaches the error.
+        """
+
+        # Lexer for the source, sharing the compiled token DFAs
+        lexer = self.lexer if source is None else self.lexer.for_source(source)
+
+        if self.parse_tables is not None:
+            return self.events_compressed(lexer)
+        return self.events_dict(lexer)
+
+    def number_symbols(self):
+        """ Number the grammar symbols for the nodes of parse trees.
+
+        self.symbol_names lists the terminals, the nonterminals and 
+        epsilon, self.symbol_ids maps each of them to its index, 
+        self.rule_symbols holds the id of the lhs of each rule, and
+        self.rule_lengths the number of symbols on its rhs (0 for an
+        epsilon rule).
+        """
+
+        self.symbol_names = sorted(self.terminals) + sorted(self.nonterminals) + [self.epsilon]
+        self.symbol_ids = {symbol: i for i, symbol in enumerate(self.symbol_names)}
+        self.rule_symbols = array('i', [self.symbol_ids[rule.lhs] for rule in self.rules])
+        self.rule_lengths = array('i', [len(self.rhs_symbols(rule)) for rule in self.rules])
+
+    def build_tree(self, events):
+        """ Builds the parse tree from parse events.
+
+        Parameters:
+
+        events: iterable
+            Events as yielded by the events method.
+
+        Returns: ParseTree
+            The parse tree, with a node for each token shifted and each
+            reduction, and an epsilon leaf under each epsilon reduction.
+        """
+
+        tree = ParseTree(self.symbol_names)
+        add_leaf, add_node = tree.add_leaf, tree.add_node
+        symbol_ids = self.symbol_ids
+        rule_symbols, rule_lengths = self.rule_symbols, self.rule_lengths
+        epsilon_id = symbol_ids[self.epsilon]
+
+        # Tree nodes of the symbols on the parser's stack
+        node_stack = []
+        for event in events:
+            if event[0] == SHIFT:
+                token = event[1]
+                node_stack.append(add_leaf(symbol_ids[token[0]], token[1]))
+                continue
+
+            rule_number = event[1]
+            length = rule_lengths[rule_number]
+            if length == 0:
+                children = [add_leaf(epsilon_id, None)]
+            else:
+                children = node_stack[-length:]
+                del node_stack[-length:]
+            node_stack.append(add_node(rule_symbols[rule_number], children))
+
+        return tree
+
+    def events_dict(self, lexer):
+        """ Parse the tokens of lexer, driving off the action and goto
+        dictionaries of the states.
+
+        Parameters:
+
+        lexer: Lex
+            Lexer for the source being parsed.
+
+        Returns: generator
+            The events, as returned by the events method.
+        """
+
+        # Get states from parse table, computed (or loaded) in __init__
+        table_states = self.states
+        rule_lengths = self.rule_lengths
+        shifts = 0
+        reductions = 0
 
         # Create stack
-        control_stack = [(table_states[0], None)]
+        state_stack = [table_states[0]]
 
-        # Get token from lexer
-        token = self.lexer.next_token()
+        # Get token from lexer, an empty source is just the end of input
+        token = self.fetch_next_token(lexer)
         while True:
-            current_state = control_stack[-1][0]
+            current_state = state_stack[-1]
 
             # If current token is not in action
             if token[0] not in current_state.action:
@@ -620,11 +1333,10 @@ class Parser:
                 for item in current_state.items:
                     if item.rule.rhs[0] == "eps":
                         epsilon_handled = True
-                        epsilon_node = Node("eps")
-                        new_node = Node(item.rule.lhs)
-                        new_node.children.append(epsilon_node)
                         goto_index = current_state.goto[item.rule.lhs]
-                        control_stack.append((table_states[goto_index], new_node))
+                        state_stack.append(table_states[goto_index])
+                        reductions += 1
+                        yield (REDUCE, item.rule.rule_number, item.rule.lhs)
                         break
                 if not epsilon_handled:
                     raise SourceFileSyntaxError
@@ -634,55 +1346,226 @@ class Parser:
                 action_type = current_action[0]
 
                 if action_type == "shift":
-                    # Add new state and token node to the stack
+                    # Add new state to the stack
                     next_state_idx = current_action[1]
-                    control_stack.append((table_states[next_state_idx], Node(token[1])))
+                    state_stack.append(table_states[next_state_idx])
+                    shifts += 1
+                    yield (SHIFT, token)
                     # Get next token, checking for EOFError
-                    token = self.fetch_next_token()
+                    token = self.fetch_next_token(lexer)
 
                 elif action_type == "reduce":
-                    # Perform a reduction based on the current rule
+                    # Perform a reduction based on the current rule, 
+                    # epsilon rules pop nothing (only reduced by LALR tables)
                     reduction_rule_idx = current_action[1]
                     reduction_rule = self.rules[reduction_rule_idx]
-                    constructed_node = Node(reduction_rule.lhs)
-                    for _ in reduction_rule.rhs:
-                        constructed_node.children.insert(0, control_stack.pop()[1])
+                    length = rule_lengths[reduction_rule_idx]
+                    if length:
+                        del state_stack[-length:]
 
                     # Based on goto, move to that state
-                    goto_state = control_stack[-1][0].goto[reduction_rule.lhs]
-                    control_stack.append((table_states[goto_state], constructed_node))
+                    goto_state = state_stack[-1].goto[reduction_rule.lhs]
+                    state_stack.append(table_states[goto_state])
+                    reductions += 1
+                    yield (REDUCE, reduction_rule_idx, reduction_rule.lhs)
 
                 elif action_type == "accept":
                     # Done with parsing if accepts
                     break
 
-        # Building the parse tree from the stack
-        parsed_tree = []
-        def build_tree(node):
-            if node:
-                parsed_tree.append(node.item)
-                for child in node.children:
-                    build_tree(child)
-
-        root_node = control_stack.pop()[1]
-        build_tree(root_node)
-        return parsed_tree
-    
-    def fetch_next_token(self):
+        if self.stats is not None:
+            self.stats.count("shifts", shifts)
+            self.stats.count("reductions", reductions)
+
+    def events_compressed(self, lexer):
+        """ Parse the tokens of lexer, driving off the compressed ParseTables.
+
+        Parameters:
+
+        lexer: Lex
+            Lexer for the source being parsed.
+
+        Returns: generator
+            The events, as returned by the events method.
+        """
+
+        tables = self.parse_tables
+        terminal_ids = tables.terminal_ids
+        action_base, action_check, action_value = tables.action_base, tables.action_check, tables.action_value
+        goto_base, goto_check, goto_value = tables.goto_base, tables.goto_check, tables.goto_value
+        rule_lhs, rule_length = tables.rule_lhs, tables.rule_length
+        epsilon_rule = tables.epsilon_rule
+        rules = self.rules
+        shifts = 0
+        reductions = 0
+
+        state_stack = [0]
+
+        token = self.fetch_next_token(lexer)
+        terminal = terminal_ids.get(token[0], -1)
+        while True:
+            state = state_stack[-1]
+
+            # Look up the action, 0 if there is none
+            action = 0
+            if terminal >= 0:
+                i = action_base[state] + terminal
+                if action_check[i] == state:
+                    action = action_value[i]
+
+            if action > 0:
+                # Shift to state action - 1
+                state_stack.append(action - 1)
+                shifts += 1
+                yield (SHIFT, token)
+                token = self.fetch_next_token(lexer)
+                terminal = terminal_ids.get(token[0], -1)
+                continue
+
+            if action == -1:
+                # Accept
+                break
+
+            if action < -1:
+                rule_number = -action - 1
+                length = rule_length[rule_number]
+                if length:
+                    del state_stack[-length:]
+
+            else:
+                # No action, fall back to an epsilon rule of the state
+                rule_number = epsilon_rule[state]
+                if rule_number < 0:
+                    raise SourceFileSyntaxError
+
+            # Based on goto, move to that state
+            i = goto_base[state_stack[-1]] + rule_lhs[rule_number]
+            if goto_check[i] != state_stack[-1]:
+                raise SourceFileSyntaxError
+            state_stack.append(goto_value[i])
+            reductions += 1
+            yield (REDUCE, rule_number, rules[rule_number].lhs)
+
+        if self.stats is not None:
+            self.stats.count("shifts", shifts)
+            self.stats.count("reductions", reductions)
+
+    def fetch_next_token(self, lexer=None):
         """ Safely fetches the next token or sets it as end of input. """
+        if lexer is None:
+            lexer = self.lexer
         try:
-            return self.lexer.next_token()
+            return lexer.next_token()
         except EOFError:
             return ('END_OF_INPUT', 'end')
 
 
-class Node:
-    """ 
-    Node class to hold state and item for parsing as well as children for tree
+class ParseTree:
+    """ A parse tree stored in parallel arrays, with one entry per node.
+
+    Nodes are numbered in the order they are created from the parse
+    events: a token leaf when it is shifted, and an interior node when its
+    rule is reduced.  The
+    children of a node are therefore numbered before it, and the root is
+    the last node.  For node n:
+
+    symbol[n] is the index in symbol_names of its grammar symbol, the 
+    nonterminal of an interior node, or the terminal or epsilon of a leaf.
+
+    value[n] is the index in values of the token text of a token leaf,
+    and -1 for other nodes.
+
+    children[first_child[n]: first_child[n] + child_count[n]] are its
+    children, left to right.
     """
-    def __init__(self, item):
-        self.item = item
-        self.children = []
+
+    def __init__(self, symbol_names):
+        """ Initializes an empty tree.
+
+        Parameters:
+        symbol_names: list of string
+            Names of the grammar symbols, indexed by symbol id.
+
+        Returns None
+        """
+
+        self.symbol_names = symbol_names
+        self.symbol = array('i')
+        self.value = array('i')
+        self.first_child = array('i')
+        self.child_count = array('i')
+        self.children = array('i')
+        self.values = []
+
+    def __len__(self):
+        """ Returns the number of nodes. """
+
+        return len(self.symbol)
+
+    def add_leaf(self, symbol, value):
+        """ Adds a leaf with the given symbol id, and token text value (None
+        for an epsilon leaf).  Returns the number of the new node.
+        """
+
+        if value is None:
+            self.value.append(-1)
+        else:
+            self.value.append(len(self.values))
+            self.values.append(value)
+        self.symbol.append(symbol)
+        self.first_child.append(len(self.children))
+        self.child_count.append(0)
+        return len(self.symbol) - 1
+
+    def add_node(self, symbol, children):
+        """ Adds an interior node with the given symbol id over the list
+        of child node numbers.  Returns the number of the new node.
+        """
+
+        self.value.append(-1)
+        self.symbol.append(symbol)
+        self.first_child.append(len(self.children))
+        self.child_count.append(len(children))
+        self.children.extend(children)
+        return len(self.symbol) - 1
+
+    def label(self, node):
+        """ Returns the token text of a token leaf, and the symbol name of
+        any other node.
+        """
+
+        if self.value[node] >= 0:
+            return self.values[self.value[node]]
+        return self.symbol_names[self.symbol[node]]
+
+    def preorder(self, root=None):
+        """ Returns the labels of the nodes in depth-first, pre-order, as
+        returned by Parser.parse.  The traversal keeps its own stack, so
+        any depth of tree can be visited.
+
+        Parameters:
+        root: int or None
+            Node to start from, the last node if None.
+        """
+
+        if not self.symbol:
+            return []
+
+        symbol, value, values, names = self.symbol, self.value, self.values, self.symbol_names
+        first_child, child_count, children = self.first_child, self.child_count, self.children
+
+        labels = []
+        stack = [len(symbol) - 1 if root is None else root]
+        while stack:
+            node = stack.pop()
+            if value[node] >= 0:
+                labels.append(values[value[node]])
+            else:
+                labels.append(names[symbol[node]])
+            first = first_child[node]
+            # push the children right to left, so the leftmost is visited first
+            stack.extend(reversed(children[first: first + child_count[node]]))
+        return labels
 
 if __name__ == "__main__":
     lexer_filename = "tokens1.txt"
@@ -14,17 +14,25 @@ from a regular expression, an `NFA` class to represent NFAs, and a `RegEx` class
 to process regular expressions, convert them into NFAs, and validate strings 
 against the regular expressions. The code aims to provide a framework for handling 
 regular expressions and automata, with a focus on the NFA construction part.
+The minimized DFA of each pattern is compiled once per process and shared 
+through a size-bounded LRU cache keyed by pattern and alphabet.
 """
 
 from dfa import DFA
 from nfa import NFA
-from collections import deque
+from collections import deque, OrderedDict
 
 class InvalidExpression(Exception):
 	pass
 
 state_count = 1
 
+# default number of transitions kept by a LazyDFA
+LAZY_CACHE_SIZE = 4096
+
+# default number of compiled expressions kept by the regex cache
+REGEX_CACHE_SIZE = 512
+
 class Node:
 	def __init__(self, data):
 		self.data = data
@@ -45,7 +53,7 @@ class Node:
 			# create base case NFA
 			leaf_nfa = NFA()
 			leaf_nfa.num_states = 2
-			leaf_nfa.alphabet = [self.data]
+			leaf_nfa.alphabet = [self.data] if self.data != 'e' else [] # 'e' is epsilon, not a symbol
 			leaf_nfa.transitions[state_count] = [(self.data, state_count+1)] 
 			leaf_nfa.start_st = state_count
 			leaf_nfa.accept_sts = [state_count+1]
@@ -123,17 +131,308 @@ class Node:
 
 				return union_nfa
 
+class LazyDFA:
+	"""
+	Simulates an NFA by building DFA states only as the input reaches
+	them.  NFA states are numbered as bits of an int, so a DFA state is
+	the bitset of the NFA states it contains.  At most cache_size 
+	transitions between DFA states are kept, evicting the least recently
+	used first.  The eviction rate is measured over windows of 
+	cache_size transitions: if thrash_limit transitions are evicted in
+	one window, the cache is dropped and the NFA is simulated directly,
+	so memory and work per character stay bounded for any pattern.  
+	After retry_after transitions without the cache, caching is turned
+	back on, so a workload that settles into a small working set is
+	cached again.
+	"""
+
+	def __init__(self, nfa, cache_size=LAZY_CACHE_SIZE, thrash_limit=None, retry_after=None):
+
+		# number each nfa state as a bit
+		states = {nfa.start_st, *nfa.accept_sts}
+		for state, pairs in nfa.transitions.items():
+			states.add(state)
+			states.update(next_state for char, next_state in pairs)
+		bits = {state: bit for bit, state in enumerate(states)}
+
+		# epsilon closure of every state as a bitset
+		epsilon_moves = {}
+		for state, pairs in nfa.transitions.items():
+			epsilon_moves[state] = [next_state for char, next_state in pairs if char == 'e']
+		closures = {}
+		for state in states:
+			mask = 1 << bits[state]
+			stack = [state]
+			while stack:
+				for next_state in epsilon_moves.get(stack.pop(), ()):
+					if not mask & (1 << bits[next_state]):
+						mask |= 1 << bits[next_state]
+						stack.append(next_state)
+			closures[state] = mask
+
+		# moves[char][bit] is the closure of the states reached from bit on char
+		self.moves = {}
+		for state, pairs in nfa.transitions.items():
+			for char, next_state in pairs:
+				if char != 'e':
+					char_moves = self.moves.setdefault(char, {})
+					char_moves[bits[state]] = char_moves.get(bits[state], 0) | closures[next_state]
+
+		self.start = closures[nfa.start_st]
+		self.accept_mask = 0
+		for state in nfa.accept_sts:
+			self.accept_mask |= 1 << bits[state]
+
+		# lru cache of (dfa state, char) -> dfa state
+		self.cache = OrderedDict()
+		self.cache_size = cache_size
+		self.thrash_limit = max(1, cache_size // 2) if thrash_limit is None else thrash_limit
+		self.retry_after = 8 * cache_size if retry_after is None else retry_after
+		self.caching = True
+		self.hits = 0
+		self.misses = 0
+		self.evictions = 0
+
+		# transitions and evictions in the current window, or transitions since caching stopped
+		self.window_steps = 0
+		self.window_evictions = 0
+
+	def step(self, mask, char):
+		"""
+		Returns the bitset of nfa states reached from the bitset mask 
+		on input char, without using the cache.
+		"""
+
+		char_moves = self.moves.get(char)
+		if char_moves is None:
+			return 0
+
+		next_mask = 0
+		while mask:
+			low = mask & -mask
+			next_mask |= char_moves.get(low.bit_length() - 1, 0)
+			mask ^= low
+
+		return next_mask
+
+	def transition(self, mask, char):
+		"""
+		Returns the dfa state reached from dfa state mask on input 
+		char, building and caching it if it has not been seen.
+		"""
+
+		if not self.caching:
+			self.window_steps += 1
+			if self.window_steps >= self.retry_after:
+				self.caching = True
+				self.window_steps = 0
+			return self.step(mask, char)
+
+		# start a new window of transitions
+		self.window_steps += 1
+		if self.window_steps > self.cache_size:
+			self.window_steps = 1
+			self.window_evictions = 0
+
+		key = (mask, char)
+		next_mask = self.cache.get(key)
+		if next_mask is not None:
+			self.hits += 1
+			self.cache.move_to_end(key)
+			return next_mask
+
+		self.misses += 1
+		next_mask = self.step(mask, char)
+		self.cache[key] = next_mask
+
+		if len(self.cache) > self.cache_size:
+			self.cache.popitem(last=False)
+			self.evictions += 1
+			self.window_evictions += 1
+
+			# cache is thrashing, fall back to nfa simulation for a while
+			if self.window_evictions >= self.thrash_limit:
+				self.cache.clear()
+				self.caching = False
+				self.window_steps = 0
+				self.window_evictions = 0
+
+		return next_mask
+
+	def simulate(self, str):
+		"""
+		Returns True if str is in the language of the NFA,
+		and False if not.
+		"""
+
+		mask = self.start
+		for char in str:
+			mask = self.transition(mask, char)
+			if not mask:
+				return False
+
+		return mask & self.accept_mask != 0
+
+class CompiledRegex:
+	"""
+	The automata of a regular expression, shared through the regex 
+	cache by every RegEx with the same pattern and alphabet.  table is 
+	the CompiledDFA of the minimized DFA and num_states the number of 
+	states of that DFA.  Entries are shared across the process, and
+	nothing changes them after they are built: a RegEx simulates and
+	builds its ByteDFA from its own copy of table, so callers of the
+	cache must copy table too rather than use or change it in place.
+	"""
+
+	def __init__(self, regex):
+		dfa = regex.to_nfa().to_DFA().minimize()
+		self.table = dfa.compile()
+		self.num_states = dfa.num_states
+
+class RegexCache:
+	"""
+	CompiledRegex entries keyed by pattern and alphabet, and the 
+	combined scanners of lexers keyed by alphabet and token patterns.
+	At most max_size entries of either kind are kept, evicting the 
+	least recently used first.  hits, misses and evictions count the 
+	lookups since the cache was created or last cleared, to size it by,
+	and scanner_hits and scanner_misses the lookups of scanners among 
+	them.
+	"""
+
+	def __init__(self, max_size=REGEX_CACHE_SIZE):
+		self.entries = OrderedDict()
+		self.max_size = max_size
+		self.hits = 0
+		self.misses = 0
+		self.evictions = 0
+		self.scanner_hits = 0
+		self.scanner_misses = 0
+
+	def lookup(self, key, build):
+		"""
+		Returns the entry cached under key, or calls build with no 
+		arguments to make it and caches the result.  Returns a pair of
+		the entry and whether it was found.
+		"""
+
+		entry = self.entries.get(key)
+		if entry is not None:
+			self.hits += 1
+			self.entries.move_to_end(key)
+			return entry, True
+
+		self.misses += 1
+		entry = build()
+		self.entries[key] = entry
+		self.evict()
+
+		return entry, False
+
+	def get(self, regex):
+		"""
+		Returns the CompiledRegex of the RegEx regex, compiling it if
+		no expression with the same pattern and alphabet is cached.
+		"""
+
+		# the alphabet only decides which characters are operands, so its order is left out of the key
+		key = ("regex", ''.join(regex.regex), ''.join(sorted(set(regex.alphabet))))
+		compiled, _ = self.lookup(key, lambda: CompiledRegex(regex))
+
+		return compiled
+
+	def scanner(self, alphabet, tokens, build):
+		"""
+		Returns the CompiledDFA scanning the tokens of a lexer, whose 
+		alphabet is the list alphabet and whose tokens are the (name, 
+		RegEx) pairs of tokens in priority order.  build is called with
+		no arguments to make it if no lexer with the same alphabet and
+		token patterns is cached.  The scanner is shared, so it must not
+		be changed.
+		"""
+
+		key = ("scanner", ''.join(sorted(set(alphabet))),
+			tuple((name, ''.join(regex.regex)) for name, regex in tokens))
+		scanner, found = self.lookup(key, build)
+		if found:
+			self.scanner_hits += 1
+		else:
+			self.scanner_misses += 1
+
+		return scanner
+
+	def evict(self):
+		"""
+		Drops the least recently used entries until at most max_size 
+		are left.
+		"""
+
+		while len(self.entries) > self.max_size:
+			self.entries.popitem(last=False)
+			self.evictions += 1
+
+	def resize(self, max_size):
+		"""
+		Sets the number of entries kept to max_size, evicting entries
+		if more are cached.  A max_size of 0 turns caching off.
+		"""
+
+		self.max_size = max_size
+		self.evict()
+
+	def clear(self):
+		"""
+		Drops every entry and resets the statistics.
+		"""
+
+		self.entries.clear()
+		self.hits = 0
+		self.misses = 0
+		self.evictions = 0
+		self.scanner_hits = 0
+		self.scanner_misses = 0
+
+	def info(self):
+		"""
+		Returns the statistics of the cache as a dict of hits, misses,
+		evictions, hit_rate (None before any lookup), scanner_hits, 
+		scanner_misses, size and max_size.
+		"""
+
+		lookups = self.hits + self.misses
+		return {
+			"hits": self.hits,
+			"misses": self.misses,
+			"evictions": self.evictions,
+			"hit_rate": self.hits / lookups if lookups else None,
+			"scanner_hits": self.scanner_hits,
+			"scanner_misses": self.scanner_misses,
+			"size": len(self.entries),
+			"max_size": self.max_size,
+		}
+
+# compiled expressions shared by every RegEx of the process
+regex_cache = RegexCache()
+
 class RegEx:
 
 	equivDfa = None
+	lazyDfa = None
+	byteDfa = None
 
-	def __init__(self, filename=None):
+	def __init__(self, filename=None, lazy=False, cache_size=LAZY_CACHE_SIZE):
 		"""
 		Initializes regular expression from the file "filename"
+
+		If lazy is True, simulate builds DFA states on demand with a 
+		LazyDFA keeping at most cache_size transitions, instead of 
+		building the whole DFA up front.
 		"""
 
 		self.alphabet = None
 		self.regex = None
+		self.lazy = lazy
+		self.cache_size = cache_size
 
 		if filename:
 		
@@ -155,6 +454,10 @@ class RegEx:
 		the "self" regular expression
 		"""
 
+		# implied concats are inserted into a copy, so the pattern itself
+		# stays as given and keeps its key in the regex cache
+		regex = list(self.regex)
+
 		# create initial stacks
 		operand_stack = deque()
 		operator_stack = deque()
@@ -167,25 +470,32 @@ class RegEx:
 			'(': 0
 		}
 
+		# characters that are operands, and that start an operand after an implied concat
+		operators = {'*', '|', '^', '(', ')'}
+		operand_chars = set(self.alphabet) | {'e', "\\"}
+		operand_chars -= operators
+		concat_chars = set(self.alphabet) | {'(', "\\"}
+		concat_chars -= {'*', '|', '^', ')'}
+
 		# iterate with while to handle escape chars
 		i = 0
-		while i < len(self.regex):
+		while i < len(regex):
 
-			char = self.regex[i]
+			char = regex[i]
 
-			if char in self.alphabet + ['e', "\\"] and (char not in ['*', '|', '^', '(', ')']):
+			if char in operand_chars:
 
 				if char == "\\":
 					i += 1
-					char = self.regex[i]
+					char = regex[i]
 
 				# push tree node
 				operand_stack.append(Node(char))
 
 				# add implied concat
-				if i+1 < len(self.regex):
-					if self.regex[i+1] in self.alphabet + ['(', '\\'] and (self.regex[i+1] not in ['*', '|', '^', ')']):
-						self.regex.insert(i+1, '^')
+				if i+1 < len(regex):
+					if regex[i+1] in concat_chars:
+						regex.insert(i+1, '^')
 
 			# push left paren onto operator stack
 			elif char == '(':
@@ -210,9 +520,9 @@ class RegEx:
 
 				# check for implied concat after star
 				if char == '*':
-					if i+1 < len(self.regex):
-						if self.regex[i+1] in self.alphabet + ['(', '\\'] and (self.regex[i+1] not in ['*', '|', '^', ')']):
-							self.regex.insert(i+1, '^')
+					if i+1 < len(regex):
+						if regex[i+1] in concat_chars:
+							regex.insert(i+1, '^')
 
 			elif char == ')':
 				top = operator_stack.pop()
@@ -232,9 +542,9 @@ class RegEx:
 					top = operator_stack.pop()
 
 				# if right paren followed by implied concat
-				if i+1 < len(self.regex):
-					if self.regex[i+1] in self.alphabet + ['(', '\\'] and (self.regex[i+1] not in ['*', '|', '^', ')']):
-						self.regex.insert(i+1, '^')
+				if i+1 < len(regex):
+					if regex[i+1] in concat_chars:
+						regex.insert(i+1, '^')
 
 			i += 1
 
@@ -254,14 +564,55 @@ class RegEx:
 
 		return complete_nfa
 
+	def to_byte_dfa(self):
+		"""
+		Returns a ByteDFA equivalent to the regular expression, with a
+		256-entry row per state, building it on the first call.
+		"""
+
+		if self.byteDfa == None:
+			self.byteDfa = self.compiled_table().to_bytes()
+
+		return self.byteDfa
+
+	def compile(self):
+		"""
+		Returns the CompiledRegex of the expression from the regex 
+		cache, compiling it only if no expression with the same 
+		pattern and alphabet was compiled before.
+		"""
+
+		return regex_cache.get(self)
+
+	def compiled_table(self):
+		"""
+		Returns the CompiledDFA of the expression, a copy of the table
+		of its regex cache entry made on the first call, so the shared 
+		entry is never changed through it.
+		"""
+
+		if self.equivDfa == None:
+			self.equivDfa = self.compile().table.copy()
+
+		return self.equivDfa
+
 	def simulate(self, str):
 		"""
 		Returns True if str is in the languages defined
-		by the "self" regular expression
+		by the "self" regular expression.  str may also be
+		bytes-like, whose bytes are matched with the ByteDFA
+		of the expression, or as latin-1 characters by the
+		LazyDFA if lazy is set, so no full DFA is built.
 		"""
 
-		if self.equivDfa == None:
-			nfa = self.to_nfa()
-			self.equivDfa = nfa.to_DFA()
+		if isinstance(str, (bytes, bytearray, memoryview)):
+			if not self.lazy:
+				return self.to_byte_dfa().simulate(str)
+			str = bytes(str).decode('latin-1')
+
+		if self.lazy:
+			if self.lazyDfa == None:
+				self.lazyDfa = LazyDFA(self.to_nfa(), self.cache_size)
+			return self.lazyDfa.simulate(str)
 
-		return self.equivDfa.simulate(str)
\ No newline at end of file
+		return self.compiled_table().simulate(str)
\ No newline at end of file
@@ -0,0 +1,63 @@
+"""
+file: stats.py
+
+Authors:
+Kaelan Anderson - kaelananderson@sandiego.edu
+Dillon Timmer - dtimmer@sandiego.edu
+
+Description:
+Counters and phase timings recorded by a Lex or Parser created with
+stats enabled.  Lexers and parsers created without stats keep no Stats
+object and do no extra work.  The recorded values can be exported as a
+dictionary or as JSON.
+"""
+
+import json
+
+class Stats:
+    """ Phase timings and counters of a lexer and parser. """
+
+    def __init__(self):
+        """ Initializes empty stats.
+
+        phases maps each phase name to the seconds spent in it, counters
+        maps each counter name to its value, and token_dfa_states maps
+        each token type to the number of states of its minimized DFA.
+        """
+
+        self.phases = {}
+        self.counters = {}
+        self.token_dfa_states = {}
+
+    def add_time(self, phase, seconds):
+        """ Adds seconds to the time spent in phase. """
+
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def count(self, counter, amount=1):
+        """ Adds amount to counter. """
+
+        self.counters[counter] = self.counters.get(counter, 0) + amount
+
+    def to_dict(self):
+        """ Returns the stats as a dictionary of plain values.
+
+        Returns: dict
+            "phases", "counters" and "token_dfa_states" as recorded, and
+            "tokens_per_sec", the tokens shifted per second of parsing
+            (None before anything was parsed).
+        """
+
+        parse_time = self.phases.get("parse")
+        shifts = self.counters.get("shifts", 0)
+        return {
+            "phases": dict(self.phases),
+            "counters": dict(self.counters),
+            "token_dfa_states": dict(self.token_dfa_states),
+            "tokens_per_sec": shifts / parse_time if parse_time else None,
+        }
+
+    def to_json(self, **kwargs):
+        """ Returns the stats as a JSON string.  kwargs are passed to json.dumps. """
+
+        return json.dumps(self.to_dict(), **kwargs)
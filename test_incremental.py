@@ -0,0 +1,186 @@
+# Name: test_incremental.py
+# Description: Tests incremental relexing and reparsing against lexing and
+# parsing the edited text from scratch, on the fixtures of test_pa5.py.
+
+import random
+from lexer import InvalidToken
+from parse import Parser, NonLRGrammarError, SourceFileSyntaxError
+from incremental import IncrementalParser
+
+# Fixtures whose grammar is LR for the method, and whose source parses or
+# fails with InvalidToken or SourceFileSyntaxError.  grammar9 is LALR(1) only.
+FIXTURES = {
+    "slr": [1, 2, 3, 4, 5, 6, 11, 12],
+    "lalr": [1, 2, 3, 4, 5, 6, 9, 11, 12],
+}
+
+# Rounds of edits per fixture and method.  Each round reparses the last
+# document that parsed with 1 to MAX_CHAIN edits at once.
+ROUNDS = 150
+MAX_CHAIN = 3
+
+def full_parse(parser, text):
+    """ Returns (parse tree, None) for text parsed from scratch by parser,
+    or (None, name of the exception) if it fails.
+    """
+
+    try:
+        return parser.parse([text]), None
+    except (InvalidToken, SourceFileSyntaxError) as e:
+        return None, type(e).__name__
+
+def incremental_parse(incremental, document, text, edits):
+    """ Returns (document, None) for text parsed by incremental, reparsing
+    document with edits if it is not None, or (None, name of the exception)
+    if it fails.
+    """
+
+    try:
+        if document is None:
+            return incremental.parse(text), None
+        return incremental.reparse(document, edits), None
+    except (InvalidToken, SourceFileSyntaxError) as e:
+        return None, type(e).__name__
+
+def table_tokens(table):
+    """ Returns the text and the (type, start, end, extent) of every token of
+    a TokenTable.
+    """
+
+    return table.text, [(table.type(i), table.start(i), table.end(i), table.extent(i))
+                        for i in range(len(table))]
+
+def check_relex(lexer, table, edit):
+    """ Applies edit to table with relex, and returns a list of what differs
+    from scanning the edited text again, empty if nothing does.
+    """
+
+    start, end, text = edit
+    old_text, old_tokens = table_tokens(table)
+    first, last, new_last = lexer.relex(table, start, end, text)
+    new_text, new_tokens = table_tokens(table)
+
+    errors = []
+    expected_text = old_text[:start] + text + old_text[end:]
+    if new_text != expected_text:
+        errors.append(f"relexed text {new_text!r} != {expected_text!r}")
+    if new_tokens != table_tokens(lexer.scan(expected_text))[1]:
+        errors.append(f"relexed tokens {new_tokens} != scanned tokens")
+
+    # the tokens outside the range relex reports are the old ones, shifted after it
+    delta = len(text) - (end - start)
+    shifted = [(token_type, s + delta, e + delta, x + delta) for token_type, s, e, x in old_tokens[last:]]
+    if new_tokens[:first] != old_tokens[:first] or new_tokens[new_last:] != shifted:
+        errors.append(f"tokens outside the relexed range ({first}, {last}, {new_last}) changed")
+    return errors
+
+def random_edit(rng, text, values):
+    """ Returns a random (start, end, text) edit of text.  values maps each
+    token type to the token values of the original source, so most edits
+    replace a token with another of the same type and keep the text a
+    sentence of the grammar.
+    """
+
+    kind = rng.random()
+    if kind < 0.5 and values:
+        # replace the characters of a token of the text with another token
+        token_type = rng.choice(sorted(values))
+        value = rng.choice(values[token_type])
+        positions = [i for i in range(len(text)) if text.startswith(value, i)]
+        replacement = rng.choice(values[token_type])
+        if positions:
+            start = rng.choice(positions)
+            return start, start + len(value), replacement
+        return len(text), len(text), " " + replacement
+
+    start = rng.randint(0, len(text))
+    if kind < 0.7:
+        # insert whitespace, or delete a whitespace character
+        if start < len(text) and text[start].isspace() and rng.random() < 0.5:
+            return start, start + 1, ""
+        return start, start, rng.choice([" ", "\n", "  "])
+
+    # splice in a piece of the text, deleting a few characters
+    end = min(len(text), start + rng.randint(0, 5))
+    piece_start = rng.randint(0, len(text))
+    return start, end, text[piece_start: piece_start + rng.randint(0, 6)]
+
+def test_fixture(i, method, rng):
+    """ Runs ROUNDS rounds of edits on fixture i with the parse tables built
+    by method.  Returns a list of the mismatches found, empty if none.
+    """
+
+    parser = Parser(f"tokens{i}.txt", f"grammar{i}.txt", method=method)
+    lexer = parser.lexer
+    incremental = IncrementalParser(parser)
+    text = open(f"src{i}.txt").read()
+
+    # token values of the source by type, to edit with
+    values = {}
+    table = lexer.scan(text)
+    for j in range(len(table)):
+        if table.type(j) is not None:
+            values.setdefault(table.type(j), []).append(table.value(j))
+
+    errors = []
+    document, error = incremental_parse(incremental, None, text, None)
+    if (document.preorder() if document else None, error) != full_parse(parser, text):
+        errors.append(f"parse of the source differs from Parser.parse")
+
+    for round in range(ROUNDS):
+        # the last document that parsed is edited, or the source if none did
+        base = document.text if document else text
+        before = document.preorder() if document else None
+
+        edits = []
+        edited = base
+        table = document.tokens.copy() if document else lexer.scan(base)
+        for _ in range(rng.randint(1, MAX_CHAIN)):
+            edit = random_edit(rng, edited, values)
+            edits.append(edit)
+            errors += [f"round {round}, edits {edits}: {e}" for e in check_relex(lexer, table, edit)]
+            start, end, insert = edit
+            edited = edited[:start] + insert + edited[end:]
+
+        expected = full_parse(parser, edited)
+        new_document, error = incremental_parse(incremental, document, edited, edits)
+        found = (new_document.preorder() if new_document else None, error)
+        if found != expected:
+            errors.append(f"round {round}, edits {edits}: reparse gave {found}, Parser.parse gave {expected}")
+        if new_document and table_tokens(new_document.tokens) != table_tokens(lexer.scan(edited)):
+            errors.append(f"round {round}, edits {edits}: tokens of the reparsed document differ from scan")
+        if document and document.preorder() != before:
+            errors.append(f"round {round}, edits {edits}: reparse changed the old document")
+
+        if new_document:
+            document = new_document
+        else:
+            text = edited
+
+    return errors
+
+if __name__ == "__main__":
+    rng = random.Random(370)
+    num_tests = 0
+    num_correct_tests = 0
+    for method, fixtures in FIXTURES.items():
+        for i in fixtures:
+            print(f"\nTesting incremental {method} parsing of src{i}.txt with grammar{i}.txt and tokens{i}.txt")
+            num_tests += 1
+            try:
+                errors = test_fixture(i, method, rng)
+            except NonLRGrammarError:
+                errors = [f"grammar{i}.txt should be {method.upper()}"]
+
+            if errors:
+                print(f"Incorrect.  {len(errors)} mismatches, the first:")
+                for error in errors[:3]:
+                    print(f"    {error}")
+            else:
+                print(f"Correct.  {ROUNDS} rounds of edits relexed and reparsed as from scratch")
+                num_correct_tests += 1
+
+    if num_correct_tests == num_tests:
+        print("\nAll tests correct.  Nice job!")
+    else:
+        print("\nOne or more tests incorrect.  Keep at it.")
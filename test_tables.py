@@ -0,0 +1,67 @@
+# Name: test_tables.py
+# Description: Tests the LALR(1) table construction and the compressed table
+# encoding on the fixtures of test_pa5.py.  Every fixture is run with each
+# method, slr and lalr, and each table encoding, dict and compressed.
+
+from lexer import InvalidToken
+from parse import Parser, NonLRGrammarError, SourceFileSyntaxError
+
+METHODS = ["slr", "lalr"]
+TABLES = ["dict", "compressed"]
+
+# Fixtures whose expected result differs for LALR(1), as the lines of a
+# correct file.  grammar9 is LALR(1) but not SLR, so it parses instead of
+# raising NonLRGrammarError.  grammar7, grammar8 and grammar10 are not
+# LALR(1) either, and still raise it.
+LALR_RESULTS = {
+    9: ["Valid", "S L * R L abc = R L * R L a19"],
+}
+
+def expected_result(i, method):
+    """ Returns the expected answer (an exception name, or "Valid" for a
+    parse tree) and the expected parse tree of fixture i with method.
+    """
+
+    if method == "lalr" and i in LALR_RESULTS:
+        lines = LALR_RESULTS[i]
+    else:
+        lines = open(f"correct{i}.txt").read().split("\n")
+    return lines[0].strip(), lines[1].split() if len(lines) > 1 else []
+
+def run_fixture(i, method, tables):
+    """ Returns the answer (an exception name, or "Valid" for a parse tree) and
+    the parse tree of fixture i parsed with method and tables.
+    """
+
+    try:
+        parser = Parser(f"tokens{i}.txt", f"grammar{i}.txt", f"src{i}.txt", method=method, tables=tables)
+        return "Valid", parser.parse()
+    except (InvalidToken, NonLRGrammarError, SourceFileSyntaxError) as e:
+        return type(e).__name__, []
+
+if __name__ == "__main__":
+    num_test_files = 12
+    num_tests = 0
+    num_correct_tests = 0
+    for method in METHODS:
+        for tables in TABLES:
+            for i in range(1, num_test_files + 1):
+                print(f"\nTesting grammar{i}.txt, tokens{i}.txt on src{i}.txt with {method} and {tables} tables")
+                num_tests += 1
+
+                correct_answer, correct_parse_tree = expected_result(i, method)
+                answer, parse_tree = run_fixture(i, method, tables)
+                if answer != correct_answer:
+                    print(f"Incorrect.  Expected {correct_answer}, got {answer}")
+                elif parse_tree != correct_parse_tree:
+                    print("Incorrect.")
+                    print(f"Your parse tree = {parse_tree}")
+                    print(f"Correct parse tree = {correct_parse_tree}")
+                else:
+                    print("Correct.  Parse tree correct" if answer == "Valid" else f"{answer}.  Correct")
+                    num_correct_tests += 1
+
+    if num_correct_tests == num_tests:
+        print("\nAll tests correct.  Nice job!")
+    else:
+        print("\nOne or more tests incorrect.  Keep at it.")